@@ -3,16 +3,80 @@ from bottle import Bottle, static_file, request, abort, HTTPResponse
 from pathlib import Path
 from uuid import uuid4
 import json
+import time
 
-from backend import downloader, windowhandler, log
+from backend import downloader, library, windowhandler, log, profiling
+from backend.config import get_db_read_connections
+from backend.events import task_events
 from database.download_history import download_history_db
+from database.handler import set_read_pool_size
 from database.setting import setting_db
+from util import metrics
 from util.util import get_root_dir, is_valid_uuid
 
 
 app = Bottle()
 static_folder = Path(get_root_dir(), 'frontend')
 
+request_seconds = metrics.Histogram(
+    'c00ltubee_http_request_seconds',
+    'Time spent in route handlers.',
+    ('method', 'route'),
+)
+
+
+class RequestTimer:
+    # Bottle plugin, labels by route rule so ids in URLs do not create new series.
+    # Streaming responses are only timed until their generator is returned.
+    name = 'request_timer'
+    api = 2
+
+
+    def apply(self, callback, route):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return callback(*args, **kwargs)
+
+            finally:
+                request_seconds.observe(time.perf_counter() - start, method = route.method, route = route.rule)
+
+        return wrapper
+
+
+app.install(RequestTimer())
+
+
+def _stream_json_list(key: str, items, extra: dict | None = None):
+    # Encode list items one by one so the full response never sits in memory,
+    # grouped into larger chunks to avoid a socket write per item
+    def stream():
+        chunk = f'{{"status": "success", {json.dumps(key)}: ['
+
+        for index, item in enumerate(items):
+            if index > 0:
+                chunk += ', '
+
+            chunk += json.dumps(item)
+
+            if len(chunk) >= 64 * 1024:
+                yield chunk
+                chunk = ''
+
+        chunk += ']'
+
+        for name, value in (extra or {}).items():
+            chunk += f', {json.dumps(name)}: {json.dumps(value)}'
+
+        yield chunk + '}'
+
+    headers = {
+        'Content-Type': 'application/json',
+    }
+
+    return HTTPResponse(status = 200, body = stream(), headers = headers)
+
 
 # 
 # Entry
@@ -25,13 +89,36 @@ def index():
 # 
 # History
 # 
+@app.get('/history/list')
+def list_history():
+    cursor = request.query.get('cursor') or None
+    status_type = request.query.get('status_type') or None
+
+    try:
+        limit = int(request.query.get('limit', 100))
+
+    except ValueError:
+        abort(406, 'Invalid limit sent')
+
+    if not 0 < limit <= 1000:
+        abort(406, 'Invalid limit sent')
+
+    try:
+        history, next_cursor = download_history_db.get_page(limit, cursor, status_type)
+
+    except ValueError:
+        abort(406, 'Invalid cursor sent')
+
+    return _stream_json_list('history', history, { 'next_cursor': next_cursor })
+
+
 @app.get('/history/get/<id>')
 def get_history(id):
+    if id == 'all':
+        return _stream_json_list('history', download_history_db.iter_all())
+
     try:
-        if id == 'all':
-            history = download_history_db.get_all_as_list()
-        
-        elif is_valid_uuid(id):
+        if is_valid_uuid(id):
             history = download_history_db.get_by_id_as_dict(id)
         
         else:
@@ -88,7 +175,8 @@ def start_download():
     else:
         abort(406, 'Invalid id sent')
     
-    downloader.add_task_to_queue(id, url)
+    # A duplicate of an active task is merged into it, the UI follows the returned id
+    id = downloader.add_task_to_queue(id, url)
 
     response = {
         'status': 'success',
@@ -98,6 +186,50 @@ def start_download():
     return HTTPResponse(status = 200, body = json.dumps(response))
 
 
+@app.post('/downloader/start/downloads')
+def start_downloads():
+    urls = request.json['urls']
+    req_ids = request.json.get('ids')
+
+    if not urls or not isinstance(urls, list):
+        abort(404, 'urls not found')
+
+    if req_ids is None:
+        req_ids = [None] * len(urls)
+
+    elif not isinstance(req_ids, list) or len(req_ids) != len(urls):
+        abort(406, 'ids and urls length mismatch')
+
+    tasks = []
+
+    for url, req_id in zip(urls, req_ids):
+        # Checked before anything is queued, so a bad entry rejects the whole batch
+        if not isinstance(url, str) or not url.strip():
+            abort(406, 'Invalid url sent')
+
+        # Assign tasks before the UI starts listening
+        if req_id is None:
+            id = str(uuid4())
+
+        elif isinstance(req_id, str) and is_valid_uuid(req_id):
+            id = req_id
+
+        else:
+            abort(406, 'Invalid id sent')
+
+        tasks.append((id, url))
+
+    # Duplicates of active tasks are merged, so ids may repeat or differ from the requested ones
+    ids = downloader.add_tasks_to_queue(tasks)
+
+    response = {
+        'status': 'success',
+        'ids': ids,
+    }
+
+    return HTTPResponse(status = 200, body = json.dumps(response))
+
+
 @app.get('/downloader/start/worker')
 def start_worker():
     downloader.start_worker()
@@ -127,14 +259,59 @@ def get_download_status(id):
     return HTTPResponse(status = 200, body = json.dumps(response))
 
 
+@app.get('/downloader/events')
+def stream_task_events():
+    # Server-Sent Events, one connection carries status changes of every task
+    def stream():
+        subscription = task_events.subscribe()
+
+        try:
+            # Late subscribers still need the current state of every task
+            pending = downloader.get_all_task_info()
+
+            while True:
+                if not pending:
+                    # Comment line keeps the connection alive and detects closed clients
+                    yield ': keepalive\n\n'
+
+                for id, info in pending.items():
+                    event = {
+                        'id': id,
+                        'info': info,
+                    }
+
+                    yield f'data: {json.dumps(event)}\n\n'
+
+                pending = subscription.wait(timeout = 15)
+
+        finally:
+            task_events.unsubscribe(subscription)
+
+    headers = {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+    }
+
+    return HTTPResponse(status = 200, body = stream(), headers = headers)
+
+
 @app.get('/downloader/get/log/<id>')
 def get_log(id):
     if not is_valid_uuid(id):
         abort(406, 'Invalid id sent')
     
-    log_content = log.get_log(id)
+    try:
+        offset = int(request.query.get('offset', 0))
+
+    except ValueError:
+        abort(406, 'Invalid offset sent')
 
-    if log_content is None:
+    if offset < 0:
+        abort(406, 'Invalid offset sent')
+
+    log_chunk = log.get_log(id, offset)
+
+    if log_chunk is None:
         response = {
             'status': 'no log content found',
         }
@@ -143,12 +320,43 @@ def get_log(id):
 
     response = {
         'status': 'success',
-        'content': log_content,
+        **log_chunk,
     }
 
     return HTTPResponse(status = 200, body = json.dumps(response))
 
 
+@app.get('/downloader/get/profile/<id>')
+def get_profile(id):
+    if not is_valid_uuid(id):
+        abort(406, 'Invalid id sent')
+
+    profile = profiling.get_profile(id)
+
+    if profile is None:
+        abort(404, 'Profile not found')
+
+    response = {
+        'status': 'success',
+        **profile,
+    }
+
+    return HTTPResponse(status = 200, body = json.dumps(response))
+
+
+@app.get('/downloader/get/profile/<id>/<stage>')
+def get_profile_dump(id, stage):
+    if not is_valid_uuid(id):
+        abort(406, 'Invalid id sent')
+
+    dump_path = profiling.get_dump(id, stage)
+
+    if dump_path is None:
+        abort(404, 'Profile dump not found')
+
+    return static_file(dump_path.name, root = dump_path.parent, download = True)
+
+
 @app.get('/downloader/cancel/<id>')
 def cancel_download(id):
     if not is_valid_uuid(id):
@@ -163,6 +371,32 @@ def cancel_download(id):
     return HTTPResponse(status = 200, body = json.dumps(response))
 
 
+@app.get('/library/rescan')
+def rescan_library():
+    library.start_rescan(setting_db.get_value_by_name('download_location'))
+
+    response = {
+        'status': 'success',
+    }
+
+    return HTTPResponse(status = 200, body = json.dumps(response))
+
+
+@app.post('/library/verify')
+def verify_library_file():
+    path = request.json['path']
+
+    if path is None:
+        abort(404, 'path not found')
+
+    response = {
+        'status': 'success',
+        'intact': library.verify(path),
+    }
+
+    return HTTPResponse(status = 200, body = json.dumps(response))
+
+
 @app.get('/setting/get/all')
 def get_settings():
     settings = setting_db.get_all_as_list()
@@ -186,6 +420,19 @@ def save_setting():
 
     setting_db.update_user_value_by_name(name, value)
 
+    # Resize the worker pools right away instead of waiting for the next batch
+    if name in ('max_concurrent_downloads', 'max_concurrent_probes', 'max_concurrent_postprocessing'):
+        downloader.start_worker()
+
+    if name in ('bandwidth_limit', 'bandwidth_schedule'):
+        downloader.bandwidth_governor.refresh()
+
+    if name in ('log_retention_days', 'log_max_total_mb'):
+        log.schedule_maintenance()
+
+    if name == 'db_read_connections':
+        set_read_pool_size(get_db_read_connections())
+
     response = {
         'status': 'success',
     }
@@ -193,6 +440,21 @@ def save_setting():
     return HTTPResponse(status = 200, body = json.dumps(response))
 
 
+# 
+# Metrics
+# 
+
+@app.get('/metrics')
+def get_metrics():
+    downloader.collect_metrics()
+
+    headers = {
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+    }
+
+    return HTTPResponse(status = 200, body = metrics.render(), headers = headers)
+
+
 # 
 # Uncategorized
 # 
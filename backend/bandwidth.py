@@ -0,0 +1,101 @@
+from typing import Callable
+import threading
+import time
+
+
+class TaskBucket:
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.rate: float | None = None
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+
+
+class BandwidthGovernor:
+    def __init__(
+        self,
+        get_rate: Callable[[], float | None],
+        refresh_interval: float = 1.0,
+        burst_seconds: float = 1.0,
+    ):
+        # Returns the global limit in bytes per second, None for unlimited
+        self.get_rate = get_rate
+
+        # The limit depends on the time of day, so it is looked up again this often
+        self.refresh_interval = refresh_interval
+        self.burst_seconds = burst_seconds
+
+        self.buckets: dict[str, TaskBucket] = {}
+        self.lock = threading.Lock()
+
+        self.rate: float | None = None
+        self.last_refresh = 0.0
+
+
+    def register(self, id: str, weight: float = 1.0):
+        with self.lock:
+            self.buckets[id] = TaskBucket(weight)
+            self.rebalance()
+
+
+    def unregister(self, id: str):
+        with self.lock:
+            self.buckets.pop(id, None)
+            self.rebalance()
+
+
+    def refresh(self):
+        with self.lock:
+            self.last_refresh = 0.0
+            self.rebalance()
+
+
+    def rebalance(self):
+        # Caller must hold the lock
+        now = time.monotonic()
+
+        if now - self.last_refresh >= self.refresh_interval:
+            self.rate = self.get_rate()
+            self.last_refresh = now
+
+        total_weight = sum(bucket.weight for bucket in self.buckets.values())
+
+        for bucket in self.buckets.values():
+            if self.rate is None or total_weight <= 0:
+                bucket.rate = None
+            else:
+                bucket.rate = self.rate * bucket.weight / total_weight
+
+
+    def consume(self, id: str, amount: int) -> float:
+        # Returns how long the caller should wait before transferring more
+        with self.lock:
+            if time.monotonic() - self.last_refresh >= self.refresh_interval:
+                self.rebalance()
+
+            bucket = self.buckets.get(id)
+
+            if bucket is None or bucket.rate is None:
+                return 0.0
+
+            now = time.monotonic()
+
+            bucket.tokens = min(
+                bucket.rate * self.burst_seconds,
+                bucket.tokens + (now - bucket.last_refill) * bucket.rate,
+            )
+            bucket.last_refill = now
+            bucket.tokens -= amount
+
+            if bucket.tokens >= 0:
+                return 0.0
+
+            return -bucket.tokens / bucket.rate
+
+
+    def get_info(self) -> dict:
+        with self.lock:
+            return {
+                'rate': self.rate,
+                'tasks': { id: bucket.rate for id, bucket in self.buckets.items() },
+            }
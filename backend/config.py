@@ -1,10 +1,30 @@
+import copy
+from datetime import datetime, time as dt_time
 from pathlib import Path
+import re
 
 from database.setting import setting_db
 from util.util import get_root_dir, current_os
 
 
+# (settings version, options) of the last built downloader options
+_downloader_opts_cache: tuple[int, dict] | None = None
+
+
 def get_downloader_opts():
+    global _downloader_opts_cache
+
+    # Snapshot version first, so a concurrent change only causes a rebuild next time
+    version = setting_db.version
+
+    if _downloader_opts_cache is None or _downloader_opts_cache[0] != version:
+        _downloader_opts_cache = (version, build_downloader_opts())
+
+    # yt-dlp fills in nested option dicts, so every task gets its own copy
+    return copy.deepcopy(_downloader_opts_cache[1])
+
+
+def build_downloader_opts():
     vendor_dir = Path(get_root_dir(), 'vendor')
     qjs_exe = 'qjs.exe' if current_os == 'win32' else 'qjs'
 
@@ -33,6 +53,8 @@ def get_downloader_opts():
             'default': setting_db.get_value_by_name('output_template'),
         },
         'noplaylist': True,
+        # Resume from existing .part files, e.g. tasks interrupted by closing the app
+        'continuedl': True,
         'color': 'never',
         'ffmpeg_location': str(Path(vendor_dir, 'ffmpeg', current_os, 'bin')),
         'js_runtimes': {
@@ -54,5 +76,97 @@ def get_downloader_opts():
         })
 
         downloader_opts.pop('merge_output_format')
+
+    # Playlists are expanded into one task per entry, flat extraction only lists the entries
+    if setting_db.get_value_by_name('playlist_mode') == 'true':
+        downloader_opts.update({
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+        })
     
-    return downloader_opts
\ No newline at end of file
+    return downloader_opts
+
+
+def get_int_setting(name: str) -> int:
+    value = setting_db.get_value_by_name(name)
+
+    # Fall back to the default for values the user typed incorrectly
+    try:
+        return max(1, int(value))
+
+    except ValueError:
+        return max(1, int(setting_db.get_by_name_as_dict(name)['default_value']))
+
+
+def get_max_concurrent_downloads() -> int:
+    return get_int_setting('max_concurrent_downloads')
+
+
+def get_max_concurrent_probes() -> int:
+    return get_int_setting('max_concurrent_probes')
+
+
+def get_max_concurrent_postprocessing() -> int:
+    return get_int_setting('max_concurrent_postprocessing')
+
+
+def get_max_fragment_connections() -> int:
+    return get_int_setting('max_fragment_connections')
+
+
+def get_db_read_connections() -> int:
+    return get_int_setting('db_read_connections')
+
+
+def get_log_retention_days() -> int:
+    return get_int_setting('log_retention_days')
+
+
+def get_log_max_total_bytes() -> int:
+    return get_int_setting('log_max_total_mb') * 1024 * 1024
+
+
+def parse_rate(value: str) -> float | None:
+    # Accepts plain bytes per second or a K/M/G suffix, e.g. "500K" or "2M". Zero means unlimited.
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([kmg]?)i?b?', value.strip(), re.IGNORECASE)
+
+    if match is None:
+        return None
+
+    number, unit = match.groups()
+    rate = float(number) * 1024 ** ('', 'k', 'm', 'g').index(unit.lower())
+
+    return rate if rate > 0 else None
+
+
+def parse_clock(value: str) -> dt_time:
+    hour, minute = value.strip().split(':')
+
+    return dt_time(int(hour), int(minute))
+
+
+def get_bandwidth_limit(now: datetime | None = None) -> float | None:
+    now = (now or datetime.now()).time()
+
+    # Schedule looks like "09:00-18:00=1M, 18:00-23:00=4M", the first matching window wins
+    schedule = setting_db.get_value_by_name('bandwidth_schedule')
+
+    for entry in schedule.split(','):
+        try:
+            window, rate = entry.split('=')
+            start, end = (parse_clock(clock) for clock in window.split('-'))
+
+        except ValueError:
+            continue
+
+        # Windows may wrap around midnight
+        if start <= end:
+            in_window = start <= now < end
+        else:
+            in_window = now >= start or now < end
+
+        if in_window:
+            return parse_rate(rate)
+
+    return parse_rate(setting_db.get_value_by_name('bandwidth_limit'))
@@ -1,36 +1,81 @@
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from queue import Queue
+from typing import TYPE_CHECKING
 import threading
-
-from yt_dlp import YoutubeDL
-
-from backend.config import get_downloader_opts
+import time
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+from uuid import uuid4
+
+from backend import library
+from backend.bandwidth import BandwidthGovernor
+from backend.config import (
+    get_bandwidth_limit,
+    get_downloader_opts,
+    get_max_concurrent_downloads,
+    get_max_concurrent_postprocessing,
+    get_max_concurrent_probes,
+    get_max_fragment_connections,
+)
+from backend.fragments import FragmentTuner, is_fragmented
+from backend.postprocess import PostprocessJob, get_deferred_youtube_dl, run_steps
+from backend.profiling import profile_stage
+from backend.progress import ProgressAggregator
+from backend.tasklog import task_log_writer
+from backend.events import task_events
+from backend.worker import WorkerPool
 from database.download_history import download_history_db
+from database.metadata_cache import metadata_cache_db
+from util.metrics import Counter, Gauge
 from util.util import get_app_data_location
 
+# yt-dlp takes a good part of startup to import, it is only loaded once the first task needs it
+if TYPE_CHECKING:
+    from yt_dlp import YoutubeDL
+
 
+probe_queue = Queue()
 download_queue = Queue()
+postprocess_queue = Queue()
 download_tasks = {}
-cancelling_tasks = set()
+
+# Task id -> the attempt (task dict) being cancelled, a redownload under the same id is not affected
+cancelling_tasks: dict[str, dict] = {}
+
+# Canonical key -> id of the active task for that video, and the reverse
+active_canonical_keys: dict[str, str] = {}
+task_canonical_keys: dict[str, str] = {}
+canonical_keys_lock = threading.Lock()
+
+# URLs no extractor but the generic one accepts, normalized by get_memo_url()
+unsupported_urls: set[str] = set()
+
+hook_calls = Counter('c00ltubee_hook_calls_total', 'yt-dlp progress hook calls.', ('status',))
+task_transitions = Counter('c00ltubee_task_transitions_total', 'Task status changes.', ('from', 'to'))
+queue_depth = Gauge('c00ltubee_queue_depth', 'Tasks waiting for a worker.', ('stage',))
+workers = Gauge('c00ltubee_workers', 'Workers per stage.', ('stage', 'state'))
+task_speed = Gauge('c00ltubee_task_bytes_per_second', 'Smoothed transfer speed per task.', ('task_id',))
+total_speed = Gauge('c00ltubee_bytes_per_second', 'Smoothed transfer speed of all tasks.')
 
 
 class Logger:
     def __init__(self, id: str):
         today = datetime.now().strftime('%Y-%m-%d')
 
+        self.id = id
         self.log_path = Path(get_app_data_location(), 'logs', today, f'{id}.log')
+
+        # Set once the site rate limited us, used to back off fragment concurrency
+        self.throttled = False
     
 
     def write_log(self, msg: str):
-        log_path_parent = self.log_path.parent
+        if 'HTTP Error 429' in msg or 'Too Many Requests' in msg:
+            self.throttled = True
 
-        if not log_path_parent.exists():
-            log_path_parent.mkdir(parents = True)
-        
-        # Without encoding format, non-English message will look weird
-        with self.log_path.open(mode = 'a', encoding = 'utf-8') as f:
-            f.write(msg + '\n')
+        # Buffered, yt-dlp logs far too often to open the file for every line
+        task_log_writer.write(self.id, self.log_path, msg)
     
 
     def debug(self, msg: str):
@@ -45,13 +90,37 @@ class Logger:
         self.write_log(msg)
 
 
+def update_task(id: str, info: dict):
+    task = download_tasks.setdefault(id, {})
+
+    if 'status' in info and info['status'] != task.get('status'):
+        task_transitions.inc(**{ 'from': task.get('status', 'none'), 'to': info['status'] })
+
+    task.update(info)
+
+    # The video can be submitted again once this task is done with it
+    if info.get('status') in ('finished', 'error', 'cancelled'):
+        release_canonical_key(id)
+
+        # Nothing is logged after this, the complete log is on disk and the file is closed
+        task_log_writer.close(id)
+
+    # Publish a copy so subscribers never see a half-updated dict
+    task_events.publish(id, dict(task))
+
+
 def on_task_error(id: str):
     download_history_db.update_status_by_id(id, 'error')
 
-    download_tasks[id].update({ 'status': 'error' })
+    update_task(id, { 'status': 'error' })
 
 
-def on_task_success(id: str, title: str | None = None, url: str | None = None):
+def on_task_success(
+    id: str,
+    title: str | None = None,
+    url: str | None = None,
+    log_file_path: str | None = None,
+):
     task = {
         'status': 'finished',
         'progress': 100,
@@ -63,6 +132,7 @@ def on_task_success(id: str, title: str | None = None, url: str | None = None):
             title,
             url,
             'finished',
+            log_file_path,
         )
 
         task.update({ 'title': title })
@@ -70,42 +140,76 @@ def on_task_success(id: str, title: str | None = None, url: str | None = None):
     else:
         download_history_db.update_status_by_id(id, 'finished')
 
-    download_tasks[id].update(task)
+    update_task(id, task)
 
 
 def handle_cancelling(id: str):
     download_history_db.update_status_by_id(id, 'cancelled')
 
-    download_tasks[id].update({ 'status': 'cancelled' })
+    update_task(id, { 'status': 'cancelled' })
+
+
+def on_task_cancelled(id: str, task: dict):
+    if cancelling_tasks.get(id) is task:
+        cancelling_tasks.pop(id, None)
+
+    # A redownload already owns the id, its state must not be touched
+    if is_current_task(id, task):
+        handle_cancelling(id)
+
+
+def is_current_task(id: str, task: dict) -> bool:
+    # A retried task gets a new dict, queue entries left from the previous attempt are stale
+    return download_tasks.get(id) is task
+
+
+def is_cancelled(id: str, task: dict) -> bool:
+    # Cancelled by the user, or replaced by a redownload while still running
+    return cancelling_tasks.get(id) is task or not is_current_task(id, task)
 
 
-def on_task_cancelled(id: str):
-    handle_cancelling(id)
+def throttle(id: str, task: dict, amount: int):
+    delay = bandwidth_governor.consume(id, amount)
 
-    cancelling_tasks.discard(id)
+    # Sleep in slices so cancelling stays responsive
+    while delay > 0 and not is_cancelled(id, task):
+        time.sleep(min(delay, 0.5))
+        delay -= 0.5
 
 
-def create_hook(id: str):
+def create_hook(id: str, task: dict):
+    # Bytes already counted against the bandwidth limit, per file (video and audio are separate files)
+    counted_bytes: dict[str, int] = {}
+
     def hooks(d: dict):
-        if id in cancelling_tasks:
+        if is_cancelled(id, task):
             raise Exception(f'Task {id} cancelled by user')
 
         status = d.get('status')
 
+        hook_calls.inc(status = status)
+
         match status:
             case 'downloading':
-                # Safely calculate percentage
-                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                percentage = (downloaded_bytes / total * 100) if total > 0 else 0
-
-                download_tasks[id].update({
-                    'status': 'downloading',
-                    'progress': round(percentage, 2),
-                })
+                # Rate limited, most calls return without publishing anything
+                progress_aggregator.update(id, d)
+
+                downloaded_bytes = d.get('downloaded_bytes') or 0
+                filename = d.get('filename', '')
+
+                # The first report of a resumed file includes the existing .part, it was not transferred now
+                new_bytes = downloaded_bytes - counted_bytes.get(filename, downloaded_bytes)
+                counted_bytes[filename] = downloaded_bytes
+
+                # Blocking the hook blocks the transfer, this is how the shared limit is enforced
+                throttle(id, task, max(0, new_bytes))
                 
+            # Sent per file, the task only finishes after post-processing
             case 'finished':
-                on_task_success(id)
+                # Updates in the last interval were dropped, the final numbers always go out
+                progress_aggregator.update(id, d, force = True)
+
+                fragment_tuner.report(id, d.get('downloaded_bytes') or d.get('total_bytes') or 0, d.get('elapsed') or 0)
             
             case 'error':
                 on_task_error(id)
@@ -114,106 +218,517 @@ def create_hook(id: str):
     return hooks
 
 
-def download_video(opts: dict, id: str, url: str, log_file_path: str):
+def get_memo_url(url: str) -> str:
+    # Only what never changes which extractor accepts a URL is normalized, the query is kept
+    parsed = urlparse(url.strip())
+
+    return parsed._replace(netloc = parsed.netloc.lower(), fragment = '').geturl()
+
+
+def get_video_key(url: str) -> str | None:
+    # Same lookup yt-dlp does before extraction, different URL forms of a video share a key
+    from yt_dlp.extractor import gen_extractor_classes
+
+    # Asking every extractor takes milliseconds, an unsupported URL submitted again (resume, redownload,
+    # the probe after queueing) is only looked up once
+    memo_url = get_memo_url(url)
+
+    if memo_url in unsupported_urls:
+        return None
+
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+
+        temp_id = ie.get_temp_id(url)
+
+        if temp_id is None:
+            return None
+
+        return f'{ie.ie_key()} {temp_id}'
+
+    # Bounded, a long session may see many URLs
+    if len(unsupported_urls) >= 4096:
+        unsupported_urls.clear()
+
+    unsupported_urls.add(memo_url)
+
+    return None
+
+
+def get_info_expiry(info: dict) -> int | None:
+    # Signed media URLs (e.g. Youtube) carry their expiry time as a query parameter
+    formats = info.get('requested_formats') or [info]
+    expiries = []
+
+    for f in formats:
+        expire = parse_qs(urlparse(f.get('url') or '').query).get('expire')
+
+        if expire and expire[0].isdigit():
+            expiries.append(int(expire[0]))
+
+    if not expiries:
+        return None
+
+    # Leave room for the download itself to start
+    return min(expiries) - 10 * 60
+
+
+def is_playlist(info: dict) -> bool:
+    return info.get('_type') in ('playlist', 'multi_video')
+
+
+def extract_info(ydl: 'YoutubeDL', url: str) -> tuple[dict, str | None]:
+    video_key = get_video_key(url)
+
+    # The same URL resolves to a single video or a playlist depending on playlist mode
+    format_spec = f'{ydl.params.get('format', '')} noplaylist={ydl.params.get('noplaylist')}'
+
+    if video_key is not None:
+        info = metadata_cache_db.get(video_key, format_spec)
+
+        if info is not None:
+            return info, video_key
+
+    info = ydl.extract_info(url, download = False, process = False)
+
+    # Playlist entries are resolved lazily while expanding, so leave them untouched
+    if is_playlist(info):
+        return info, video_key
+
+    info = ydl.process_ie_result(info, download = False)
+    info = ydl.sanitize_info(info)
+
+    if video_key is not None and info.get('_type', 'video') == 'video':
+        metadata_cache_db.put(video_key, format_spec, info, get_info_expiry(info))
+
+    return info, video_key
+
+
+@dataclass
+class ProbedTask:
+    id: str
+    url: str
+    task: dict
+    opts: dict
+    info: dict
+    video_key: str | None
+    canonical_key: str | None
+
+
+def probe_task(id: str, url: str, task: dict):
+    # Cancelled while waiting in queue, no need to touch the network
+    if is_cancelled(id, task):
+        on_task_cancelled(id, task)
+        return
+
+    canonical_key = task_canonical_keys.get(id) or get_canonical_key(url)
+
+    # Downloaded before, possibly through another URL form, and the file is still intact
+    if canonical_key is not None and library.find_existing(canonical_key) is not None:
+        history = download_history_db.get_latest_finished_by_canonical_key(canonical_key)
+
+        update_task(id, { 'title': history['title'] if history is not None else url })
+
+        on_task_success(id)
+        return
+
+    from yt_dlp import YoutubeDL
+
+    logger = Logger(id)
+
+    ydl_opts = {
+        **get_downloader_opts(),
+        'progress_hooks': [create_hook(id, task)],
+        'logger': logger,
+    }
+
     try:
-        with YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download = False)
-            info = ydl.sanitize_info(info)
+        with profile_stage(logger.log_path, 'probe', logger.write_log), YoutubeDL(ydl_opts) as ydl:
+            info, video_key = extract_info(ydl, url)
+
+            if is_playlist(info):
+                expand_playlist(id, url, task, info, str(logger.log_path))
+                return
 
             title = info.get('title')
-            
+
             output_filename = Path(ydl.prepare_filename(info))
 
-            if output_filename.exists():
-                on_task_success(id, title)
-                return
-            
-            # Support cancelling before the actual download
-            if id in cancelling_tasks:
-                on_task_cancelled(id)
-                return
+    except Exception:
+        # Exception caused by intentional cancellation
+        if is_cancelled(id, task):
+            on_task_cancelled(id, task)
+
+        else:
+            on_task_error(id)
+            raise
+
+        return
+
+    # Library index knows about renamed files and whether the file is still the one we downloaded
+    if library.find_existing(None, str(output_filename)) is not None:
+        on_task_success(id, title)
+        return
+
+    download_history_db.update_by_id(
+        id,
+        title,
+        url,
+        'queued',
+        str(logger.log_path),
+    )
+
+    # Title and filename are known long before the transfer starts
+    update_task(id, {
+        'title': title,
+        'filename': output_filename.name,
+    })
+
+    probed_task = ProbedTask(id, url, task, ydl_opts, info, video_key, canonical_key)
+    download_queue.put((probed_task,))
+
+
+def expand_playlist(id: str, url: str, task: dict, playlist: dict, log_file_path: str):
+    title = playlist.get('title') or url
+    entry_count = 0
 
-            download_history_db.update_by_id(
+    # Saved before expanding, so the extraction log is reachable while entries are still being queued
+    download_history_db.update_by_id(id, title, url, 'working', log_file_path)
+
+    update_task(id, {
+        'status': 'starting',
+        'title': title,
+        'progress': 0,
+    })
+
+    batch: list[tuple[str, str]] = []
+    last_flush = time.monotonic()
+
+    # Entries queued before a restart are already resumed on their own
+    queued_urls = download_history_db.get_child_urls(id)
+
+    # Entries is a lazy generator with flat extraction, pages are fetched while earlier entries already download
+    for entry in playlist.get('entries') or []:
+        if is_cancelled(id, task):
+            break
+
+        entry_url = (entry or {}).get('url') or (entry or {}).get('webpage_url')
+
+        if not entry_url:
+            continue
+
+        entry_count += 1
+
+        if entry_url in queued_urls:
+            continue
+
+        batch.append((str(uuid4()), entry_url))
+
+        # Flush early so the first entries start within seconds, then in larger batches
+        if len(batch) >= 50 or time.monotonic() - last_flush >= 1:
+            add_tasks_to_queue(batch, parent_id = id)
+
+            batch = []
+            last_flush = time.monotonic()
+
+    if batch:
+        add_tasks_to_queue(batch, parent_id = id)
+
+    if is_cancelled(id, task):
+        on_task_cancelled(id, task)
+        return
+
+    update_task(id, { 'entries': entry_count })
+
+    on_task_success(id, title, url, log_file_path)
+
+
+def download_task(probed_task: ProbedTask):
+    from yt_dlp.utils import DownloadError
+
+    id = probed_task.id
+    task = probed_task.task
+
+    # Support cancelling before the actual download
+    if is_cancelled(id, task):
+        on_task_cancelled(id, task)
+        return
+
+    download_history_db.update_status_by_id(id, 'working')
+
+    update_task(id, {
+        'status': 'starting',
+        'progress': 0,
+    })
+
+    bandwidth_governor.register(id)
+
+    opts = probed_task.opts
+
+    if is_fragmented(probed_task.info):
+        opts = {
+            **opts,
+            'concurrent_fragment_downloads': fragment_tuner.acquire(
                 id,
-                title,
-                url,
-                'working',
-                log_file_path
-            )
+                probed_task.info.get('extractor_key', ''),
+                lambda: is_cancelled(id, task),
+            ),
+        }
+
+    try:
+        logger = opts['logger']
+
+        with profile_stage(logger.log_path, 'download', logger.write_log), get_deferred_youtube_dl()(opts) as ydl:
+            try:
+                # Download from the resolved info, same as yt-dlp's --load-info-json
+                ydl.process_ie_result(probed_task.info, download = True)
+
+            except DownloadError:
+                if is_cancelled(id, task):
+                    raise
 
-            download_tasks[id].update({
-                'status': 'starting',
-                'title': title,
-                'progress': 0,
-            })
+                # Media URLs were resolved when the task was probed, they may have expired
+                # while it waited for a download slot (or while cached), so extract again once
+                if probed_task.video_key is not None:
+                    metadata_cache_db.delete(probed_task.video_key)
 
-            ydl.download([url])
+                ydl.write_debug('Download failed, extracting media URLs again')
+
+                ydl.deferred_steps.clear()
+                ydl.extract_info(probed_task.url, download = True)
+
+        # Cancelled or replaced after the last hook call
+        if is_cancelled(id, task):
+            on_task_cancelled(id, task)
+            return
+
+        # Nothing to post-process, e.g. yt-dlp skipped the download
+        if not ydl.deferred_steps:
+            on_task_success(id)
+            return
+
+        update_task(id, {
+            'status': 'postprocessing',
+            'progress': 100,
+        })
+
+        # CPU-bound work waits in its own queue, this download slot is free for the next transfer
+        postprocess_queue.put((PostprocessJob(id, task, opts, probed_task.canonical_key, ydl.deferred_steps),))
 
     except Exception:
         # Exception caused by intentional cancellation
-        if id in cancelling_tasks:
-            on_task_cancelled(id)
+        if is_cancelled(id, task):
+            on_task_cancelled(id, task)
             
         else:
             on_task_error(id)
             raise
 
+    finally:
+        # Remaining tasks get a bigger share
+        bandwidth_governor.unregister(id)
+
+        progress_aggregator.discard(id)
+
+        fragment_tuner.release(id, throttled = opts['logger'].throttled)
+
+
+def postprocess_task(job: PostprocessJob):
+    id = job.id
+
+    if is_cancelled(id, job.task):
+        on_task_cancelled(id, job.task)
+        return
+
+    logger = job.opts['logger']
+
+    try:
+        with profile_stage(logger.log_path, 'postprocess', logger.write_log):
+            filepaths = run_steps(job, lambda: is_cancelled(id, job.task))
+
+    except Exception:
+        if is_cancelled(id, job.task):
+            on_task_cancelled(id, job.task)
+            return
+
+        on_task_error(id)
+        raise
+
+    # Cancelled while post-processing, the files are left as they are but not indexed
+    if is_cancelled(id, job.task):
+        on_task_cancelled(id, job.task)
+        return
+
+    for filepath in filepaths:
+        library.schedule_index(filepath, job.canonical_key, id)
+
+    on_task_success(id)
+
+
+# Extraction is cheap and runs wide, transfers are bandwidth-bound and run narrow
+bandwidth_governor = BandwidthGovernor(get_bandwidth_limit)
+fragment_tuner = FragmentTuner(get_max_fragment_connections)
+progress_aggregator = ProgressAggregator(update_task)
+
+probe_pool = WorkerPool('probe', probe_queue, probe_task)
+download_pool = WorkerPool('download', download_queue, download_task)
+
+# ffmpeg is CPU-bound, it gets its own pool sized by the core count
+postprocess_pool = WorkerPool('postprocess', postprocess_queue, postprocess_task)
+
 
 def start_worker():
-    while True:
-        if download_queue.empty():
-            break
+    # Re-read the limits every time so setting changes apply without restarting
+    probe_pool.resize(get_max_concurrent_probes())
+    download_pool.resize(get_max_concurrent_downloads())
+    postprocess_pool.resize(get_max_concurrent_postprocessing())
+
+
+def collect_metrics():
+    # Gauges describe the current state, they are refreshed right before rendering
+    queue_depth.clear()
+    workers.clear()
+    task_speed.clear()
+
+    for pool in (probe_pool, download_pool, postprocess_pool, library.hash_pool):
+        info = pool.get_info()
+
+        queue_depth.set(info['queued'], stage = pool.name)
+        workers.set(info['busy'], stage = pool.name, state = 'busy')
+        workers.set(info['workers'] - info['busy'], stage = pool.name, state = 'idle')
+
+    speeds = progress_aggregator.get_speeds()
+
+    for id, speed in speeds.items():
+        task_speed.set(round(speed), task_id = id)
+
+    total_speed.set(round(sum(speeds.values())))
+
+
+def get_canonical_key(url: str) -> str | None:
+    video_key = get_video_key(url)
+
+    if video_key is not None:
+        return video_key
+
+    # Unknown sites fall back to the URL itself, without fragment and tracking parameters
+    parsed = urlparse(url.strip())
+
+    if not parsed.scheme or not parsed.netloc:
+        return None
+
+    query = urlencode([
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values = True)
+        if not name.lower().startswith('utm_')
+    ])
+
+    return f'url {parsed._replace(netloc = parsed.netloc.lower(), query = query, fragment = '').geturl()}'
+
 
-        task = download_queue.get()
+def release_canonical_key(id: str):
+    with canonical_keys_lock:
+        key = task_canonical_keys.pop(id, None)
 
-        id, url = task
+        if key is not None and active_canonical_keys.get(key) == id:
+            del active_canonical_keys[key]
 
-        logger = Logger(id)
 
-        ydl_opts = {
-            **get_downloader_opts(),
-            'progress_hooks': [create_hook(id)],
-            'logger': logger,
+def add_tasks_to_queue(tasks: list[tuple[str, str]], parent_id: str | None = None) -> list[str]:
+    # Resolved before taking the lock, the first lookup loads every extractor
+    keyed_tasks = [(id, url, get_canonical_key(url)) for id, url in tasks]
+
+    assigned_ids: list[str] = []
+    new_tasks: list[tuple[str, str, str | None]] = []
+
+    with canonical_keys_lock:
+        for id, url, key in keyed_tasks:
+            existing_id = active_canonical_keys.get(key) if key is not None else None
+
+            # Same video is already queued or running under another id, merge into it
+            if existing_id is not None and existing_id != id:
+                assigned_ids.append(existing_id)
+                continue
+
+            if key is not None:
+                active_canonical_keys[key] = id
+                task_canonical_keys[id] = key
+
+            assigned_ids.append(id)
+            new_tasks.append((id, url, key))
+
+    # Single transaction for the whole batch, existing history is kept (applicable for redownloading)
+    download_history_db.add_many_if_missing([
+        (id, 'Waiting...', url, 'queued', key) for id, url, key in new_tasks
+    ], parent_id)
+
+    for id, url, _ in new_tasks:
+        # Replace rather than merge, a retried task starts from a clean state.
+        # A previous attempt still running sees it is no longer current and stops.
+        download_tasks[id] = {}
+
+        info = {
+            'status': 'queued'
         }
 
-        task_process = threading.Thread(
-            target = download_video,
-            args = (ydl_opts, id, url, str(logger.log_path)),
-            daemon = True,
-            name = id,
-        )
+        # Lets the UI create cards for tasks it did not submit itself
+        if parent_id is not None:
+            info.update({ 'parent_id': parent_id })
 
-        task_process.start()
+        update_task(id, info)
 
+        # Workers are long-lived, so only enqueue once the task is fully registered
+        probe_queue.put((id, url, download_tasks[id]))
 
-def add_task_to_queue(id: str, url: str):
-    task = (id, url)
-    download_queue.put(task)
+    return assigned_ids
 
-    # Find existing history (applicable for redownloading)
-    try:
-        _ = download_history_db.get_by_id(id)
 
-    except:
-        download_history_db.add(
-            id,
-            'Waiting...',
-            url,
-            'queued',
-        )
+def add_task_to_queue(id: str, url: str) -> str:
+    return add_tasks_to_queue([(id, url)])[0]
 
-    download_tasks[id] = {
-        'status': 'queued'
-    }
+
+def resume_unfinished_tasks():
+    # The history table doubles as the persistent queue, anything queued or working was interrupted
+    tasks = [(history['task_id'], history['url']) for history in download_history_db.get_unfinished()]
+
+    if not tasks:
+        return
+
+    assigned_ids = add_tasks_to_queue(tasks)
+
+    # Duplicates left over from older versions would otherwise be resumed on every start
+    for (id, _), assigned_id in zip(tasks, assigned_ids):
+        if assigned_id != id:
+            download_history_db.update_status_by_id(id, 'cancelled')
+
+    start_worker()
 
 
 def get_task_info(id: str) -> dict | None:
-    return download_tasks.get(id)
+    task = download_tasks.get(id)
+
+    if task is None:
+        return None
+
+    return {
+        **task,
+        'stages': {
+            'probe': probe_pool.get_info(),
+            'download': download_pool.get_info(),
+            'postprocess': postprocess_pool.get_info(),
+        },
+    }
+
+
+def get_all_task_info() -> dict[str, dict]:
+    return { id: dict(task) for id, task in list(download_tasks.items()) }
 
 
 def cancel_task(id: str):
     if id in download_tasks:
         # Handle early cancelling
+        task = download_tasks[id]
+
         handle_cancelling(id)
         
-        cancelling_tasks.add(id)
\ No newline at end of file
+        cancelling_tasks[id] = task
\ No newline at end of file
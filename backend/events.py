@@ -0,0 +1,56 @@
+import threading
+
+
+class Subscription:
+    def __init__(self):
+        # Only the latest snapshot per task is kept, so a slow reader never piles up stale events
+        self.pending: dict[str, dict] = {}
+        self.condition = threading.Condition()
+
+
+    def push(self, id: str, info: dict):
+        with self.condition:
+            self.pending[id] = info
+            self.condition.notify()
+
+
+    def wait(self, timeout: float) -> dict[str, dict]:
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+
+            pending = self.pending
+            self.pending = {}
+
+            return pending
+
+
+class EventBus:
+    def __init__(self):
+        self.subscriptions: set[Subscription] = set()
+        self.lock = threading.Lock()
+
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+
+        with self.lock:
+            self.subscriptions.add(subscription)
+
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+
+    def publish(self, id: str, info: dict):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+
+        for subscription in subscriptions:
+            subscription.push(id, info)
+
+
+task_events = EventBus()
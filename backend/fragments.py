@@ -0,0 +1,127 @@
+from typing import Callable
+import threading
+
+
+# Protocols yt-dlp downloads fragment by fragment
+fragmented_protocols = ('m3u8', 'm3u8_native', 'http_dash_segments', 'http_dash_segments_generator', 'ism', 'f4m')
+
+
+def is_fragmented(info: dict) -> bool:
+    formats = info.get('requested_formats') or [info]
+
+    return any(f.get('protocol') in fragmented_protocols for f in formats)
+
+
+class HostState:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.throughput: float | None = None
+
+
+class Lease:
+    def __init__(self, host: str):
+        self.host = host
+        self.concurrency = 1
+        self.downloaded_bytes = 0
+        self.elapsed = 0.0
+
+
+class FragmentTuner:
+    def __init__(
+        self,
+        get_budget: Callable[[], int],
+        initial_concurrency: int = 2,
+        max_concurrency: int = 16,
+    ):
+        # Total fragment connections allowed across every active task
+        self.get_budget = get_budget
+
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+
+        # Learned per extractor, since throttling behaviour is a property of the site
+        self.hosts: dict[str, HostState] = {}
+        self.leases: dict[str, Lease] = {}
+        self.lock = threading.Lock()
+
+        # Notified whenever a lease is released
+        self.released = threading.Condition(self.lock)
+
+
+    def acquire(self, id: str, host: str, is_cancelled: Callable[[], bool] = lambda: False) -> int:
+        # Running tasks keep their connections, a new task only gets what is left of the budget.
+        # Once it is used up, the task waits for another one to release its lease.
+        with self.lock:
+            state = self.hosts.setdefault(host, HostState(self.initial_concurrency))
+
+            while True:
+                remaining = max(1, self.get_budget()) - sum(lease.concurrency for lease in self.leases.values())
+
+                # A cancelled task is not going to transfer anything, the hook stops it right away
+                if remaining >= 1 or is_cancelled():
+                    break
+
+                # Woken up by releases, the timeout also picks up budget changes and cancelling
+                self.released.wait(timeout = 1)
+
+            lease = Lease(host)
+            lease.concurrency = max(1, min(state.concurrency, remaining))
+            self.leases[id] = lease
+
+            return lease.concurrency
+
+
+    def report(self, id: str, downloaded_bytes: int, elapsed: float):
+        with self.lock:
+            lease = self.leases.get(id)
+
+            if lease is None:
+                return
+
+            # Video and audio are reported separately
+            lease.downloaded_bytes += downloaded_bytes
+            lease.elapsed += elapsed
+
+
+    def release(self, id: str, throttled: bool = False):
+        with self.lock:
+            lease = self.leases.pop(id, None)
+
+            if lease is None:
+                return
+
+            self.released.notify_all()
+
+            state = self.hosts[lease.host]
+
+            # Back off hard when the site pushes back
+            if throttled:
+                state.concurrency = max(1, lease.concurrency // 2)
+                state.throughput = None
+                return
+
+            if lease.elapsed <= 0 or lease.downloaded_bytes <= 0:
+                return
+
+            # A lease cut short by the budget says nothing about what the site can take
+            if lease.concurrency < state.concurrency:
+                return
+
+            throughput = lease.downloaded_bytes / lease.elapsed
+
+            # Hill climbing, keep growing while more workers still pay off
+            if state.throughput is None or throughput > state.throughput * 1.1:
+                state.concurrency = min(self.max_concurrency, lease.concurrency + 1)
+
+            elif throughput < state.throughput * 0.9:
+                state.concurrency = max(1, state.concurrency - 1)
+
+            state.throughput = throughput
+
+
+    def get_info(self) -> dict:
+        with self.lock:
+            return {
+                'hosts': { host: state.concurrency for host, state in self.hosts.items() },
+                'active': { id: lease.concurrency for id, lease in self.leases.items() },
+            }
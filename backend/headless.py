@@ -0,0 +1,111 @@
+from uuid import uuid4
+import json
+import sys
+
+from backend import downloader
+from backend.events import task_events
+
+
+terminal_statuses = ('finished', 'error', 'cancelled')
+
+usage = '''Usage: main.py headless [FILE]
+
+Download every URL in FILE (one per line, "-" or no FILE reads stdin).
+Progress is printed as one JSON object per line. Exit code is 0 when every
+task finished, 1 when any task failed or was cancelled, 2 on bad usage.'''
+
+
+def read_urls(source: str) -> list[str]:
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+
+    else:
+        with open(source, encoding = 'utf-8') as f:
+            lines = f.read().splitlines()
+
+    # Blank lines and comments are allowed in URL lists
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+def print_event(event: dict):
+    print(json.dumps(event), flush = True)
+
+
+def run(urls: list[str]) -> int:
+    # Subscribe first, fast tasks may finish before the first wait
+    subscription = task_events.subscribe()
+
+    # Set before queueing, an interrupt may come while tasks are still being added
+    tasks = [(str(uuid4()), url) for url in urls]
+    tracked = { id for id, _ in tasks }
+    statuses: dict[str, str] = {}
+    interrupted = False
+
+    try:
+        ids = downloader.add_tasks_to_queue(tasks)
+
+        # Duplicates are merged, follow the ids the tasks ended up with
+        tracked = set(ids)
+
+        for id, (_, url) in zip(ids, tasks):
+            print_event({ 'event': 'queued', 'id': id, 'url': url })
+
+        downloader.start_worker()
+
+        while any(statuses.get(id) not in terminal_statuses for id in tracked):
+            pending = subscription.wait(timeout = 1)
+
+            for id, info in pending.items():
+                # Playlist entries are tracked like the tasks we submitted
+                if info.get('parent_id') in tracked:
+                    tracked.add(id)
+
+                if id not in tracked:
+                    continue
+
+                statuses[id] = info.get('status')
+
+                print_event({ 'event': 'status', 'id': id, **info })
+
+    except KeyboardInterrupt:
+        interrupted = True
+
+        for id in tracked:
+            if statuses.get(id) not in terminal_statuses:
+                downloader.cancel_task(id)
+                statuses[id] = 'cancelled'
+
+    finally:
+        task_events.unsubscribe(subscription)
+
+    summary = {
+        status: sum(1 for id in tracked if statuses.get(id) == status)
+        for status in terminal_statuses
+    }
+
+    print_event({ 'event': 'summary', 'total': len(tracked), **summary })
+
+    return 0 if not interrupted and summary['finished'] == len(tracked) else 1
+
+
+def main(args: list[str]) -> int:
+    if len(args) > 1 or (args and args[0] in ('-h', '--help')):
+        print(usage, file = sys.stderr)
+        return 2
+
+    try:
+        urls = read_urls(args[0] if args else '-')
+
+    except OSError as e:
+        print(f'Cannot read URLs: {e}', file = sys.stderr)
+        return 2
+
+    # Interrupted before anything was queued
+    except KeyboardInterrupt:
+        return 1
+
+    if not urls:
+        print('No URLs given', file = sys.stderr)
+        return 2
+
+    return run(urls)
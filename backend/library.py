@@ -0,0 +1,154 @@
+from pathlib import Path
+from queue import Queue
+import hashlib
+import os
+import threading
+
+from backend.worker import WorkerPool
+from database.library import library_db
+
+
+# Leftovers of unfinished downloads, they are not part of the library
+partial_suffixes = ('.part', '.ytdl', '.temp')
+
+hash_queue = Queue()
+rescan_lock = threading.Lock()
+
+
+def hash_file(path: Path) -> str:
+    with path.open('rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def index_file(path: str, canonical_key: str | None = None, task_id: str | None = None):
+    file_path = Path(path)
+
+    # Removed (e.g. intermediate format merged by ffmpeg) before we got to it
+    if not file_path.is_file():
+        return
+
+    stat = file_path.stat()
+
+    library_db.upsert(
+        str(file_path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        hash_file(file_path),
+        canonical_key,
+        task_id,
+    )
+
+
+# Hashing is disk-bound, a couple of workers keep it off the download threads
+hash_pool = WorkerPool('hash', hash_queue, index_file)
+hash_pool_size = 2
+
+
+def schedule_index(path: str, canonical_key: str | None = None, task_id: str | None = None):
+    # Workers are started with the first job, not on import, startup does not need them
+    hash_pool.resize(hash_pool_size)
+
+    hash_queue.put((path, canonical_key, task_id))
+
+
+def is_unchanged(entry: dict) -> bool:
+    # Size and mtime match what was hashed, so the hash still describes the file
+    try:
+        stat = os.stat(entry['path'])
+
+    except OSError:
+        return False
+
+    return stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']
+
+
+def find_existing(canonical_key: str | None, path: str | None = None) -> dict | None:
+    # Look up by video first (survives renames found by a rescan), then by the predicted path
+    candidates = library_db.get_by_canonical_key(canonical_key) if canonical_key is not None else []
+
+    entry = library_db.get_by_path(path) if path is not None else None
+
+    if entry is not None:
+        candidates.append(entry)
+
+    for candidate in candidates:
+        if is_unchanged(candidate):
+            return candidate
+
+    return None
+
+
+def verify(path: str) -> bool:
+    # Full integrity check, the file must still hash to what was indexed
+    entry = library_db.get_by_path(path)
+
+    if entry is None or not Path(path).is_file():
+        return False
+
+    return hash_file(Path(path)) == entry['content_hash']
+
+
+def rescan(folder: str):
+    # Incremental, only new or modified files are hashed
+    with rescan_lock:
+        root = Path(folder)
+        indexed = {
+            path: entry for path, entry in library_db.get_all_under(str(root)).items()
+            if Path(path).is_relative_to(root)
+        }
+
+        found: set[str] = set()
+
+        for file_path in root.rglob('*'):
+            if not file_path.is_file() or file_path.name.endswith(partial_suffixes):
+                continue
+
+            path = str(file_path)
+            found.add(path)
+
+            entry = indexed.get(path)
+
+            if entry is not None and is_unchanged(entry):
+                continue
+
+            stat = file_path.stat()
+            content_hash = hash_file(file_path)
+
+            # Same content as an indexed file that is gone, so it was moved or renamed
+            moved_from = next((
+                candidate for candidate in library_db.get_by_hash(content_hash)
+                if candidate['path'] != path and not Path(candidate['path']).exists()
+            ), None)
+
+            if moved_from is not None and entry is None:
+                library_db.move(moved_from['path'], path, stat.st_size, stat.st_mtime_ns)
+                found.add(moved_from['path'])
+                continue
+
+            library_db.upsert(path, stat.st_size, stat.st_mtime_ns, content_hash)
+
+        for path in indexed.keys() - found:
+            library_db.delete_by_path(path)
+
+
+def refresh(folder: str):
+    # Only files already in the index are looked at, unrelated files in the folder are never hashed.
+    # Missing files are left to a full rescan, it can tell whether they were moved.
+    with rescan_lock:
+        for path, entry in library_db.get_all_under(folder).items():
+            file_path = Path(path)
+
+            if not file_path.is_file() or is_unchanged(entry):
+                continue
+
+            stat = file_path.stat()
+
+            library_db.upsert(path, stat.st_size, stat.st_mtime_ns, hash_file(file_path))
+
+
+def start_rescan(folder: str):
+    threading.Thread(target = rescan, args = (folder,), daemon = True, name = 'library-rescan').start()
+
+
+def start_refresh(folder: str):
+    threading.Thread(target = refresh, args = (folder,), daemon = True, name = 'library-refresh').start()
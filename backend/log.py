@@ -1,13 +1,294 @@
+from datetime import date, timedelta
 from pathlib import Path
+import gzip
+import shutil
+import threading
+import traceback
 
+from backend.config import get_log_max_total_bytes, get_log_retention_days
+from backend.tasklog import task_log_writer
 from database.download_history import download_history_db
+from util.util import get_app_data_location
 
 
-def get_log(task_id: str):
-    log_file_path = download_history_db.get_log_file_path_by_id(task_id)
+# Cap a single response so opening a huge log does not load it all at once
+max_chunk_bytes = 256 * 1024
 
-    if log_file_path is None:
-        return None
+logs_dir = Path(get_app_data_location(), 'logs')
 
-    with Path(log_file_path).open(encoding = 'utf-8') as f:
-        return f.read()
\ No newline at end of file
+# Retention runs on startup, then this often
+maintenance_interval = 60 * 60
+maintenance_event = threading.Event()
+
+terminal_statuses = ('finished', 'error', 'cancelled')
+
+
+def get_task_id(path: Path) -> str:
+    # <id>.log, <id>.log.gz and profiling dumps like <id>.download.prof
+    return path.name.partition('.')[0]
+
+
+class GzipCursor:
+    # Seeking backwards in a compressed log decompresses it from the start again.
+    # The log view reads a log chunk by chunk, so one open reader follows it along.
+    def __init__(self, path: Path, version: tuple[int, int]):
+        self.file = gzip.open(path, mode = 'rb')
+        self.version = version
+
+        # Read ahead but not returned yet, starts at the uncompressed offset
+        self.offset = 0
+        self.pending = b''
+
+
+    def read(self, offset: int, size: int) -> tuple[int, bytes, bool]:
+        # Returns the offset actually read from, the bytes and whether they reach the end
+        if offset < self.offset:
+            self.file.seek(0)
+            self.offset = 0
+            self.pending = b''
+
+        if offset > self.offset + len(self.pending):
+            self.pending = b''
+            self.offset = self.file.seek(offset)
+
+            # Seeking past the end stops there, the log was replaced (e.g. task redownloaded), start over
+            if self.offset < offset:
+                self.offset = self.file.seek(0)
+
+        else:
+            self.pending = self.pending[offset - self.offset:]
+            self.offset = offset
+
+        # One byte more tells whether the end is reached
+        if len(self.pending) <= size:
+            self.pending += self.file.read(size + 1 - len(self.pending))
+
+        return self.offset, self.pending[:size], len(self.pending) <= size
+
+
+    def close(self):
+        self.file.close()
+
+
+# Open cursors by path, only the most recently read logs are kept
+gzip_cursors: dict[Path, GzipCursor] = {}
+gzip_cursors_lock = threading.Lock()
+max_gzip_cursors = 8
+
+
+def read_compressed(path: Path, offset: int, size: int) -> tuple[int, bytes, bool]:
+    stat = path.stat()
+    version = (stat.st_size, stat.st_mtime_ns)
+
+    # Taken out while in use, two readers of the same log never share a cursor
+    with gzip_cursors_lock:
+        cursor = gzip_cursors.pop(path, None)
+
+    # Appended to since (a redownload on the same day was compressed into it)
+    if cursor is not None and cursor.version != version:
+        cursor.close()
+        cursor = None
+
+    if cursor is None:
+        cursor = GzipCursor(path, version)
+
+    try:
+        result = cursor.read(offset, size)
+
+    except Exception:
+        cursor.close()
+        raise
+
+    with gzip_cursors_lock:
+        replaced = gzip_cursors.pop(path, None)
+        gzip_cursors[path] = cursor
+
+        evicted = [gzip_cursors.pop(key) for key in list(gzip_cursors)[:-max_gzip_cursors]]
+
+    for old_cursor in ([replaced] if replaced is not None else []) + evicted:
+        old_cursor.close()
+
+    return result
+
+
+def close_gzip_cursor(path: Path):
+    with gzip_cursors_lock:
+        cursor = gzip_cursors.pop(path, None)
+
+    if cursor is not None:
+        cursor.close()
+
+
+def read_plain(path: Path, offset: int, size: int) -> tuple[int, bytes, bool]:
+    with path.open(mode = 'rb') as f:
+        # Log was replaced (e.g. task redownloaded), start over
+        if offset > f.seek(0, 2):
+            offset = 0
+
+        f.seek(offset)
+
+        raw_chunk = f.read(size)
+        at_end = f.read(1) == b''
+
+    return offset, raw_chunk, at_end
+
+
+def read_chunk(path: Path, offset: int) -> dict:
+    # Offsets always count uncompressed bytes, so a log compressed while being read continues seamlessly
+    if path.suffix == '.gz':
+        offset, raw_chunk, at_end = read_compressed(path, offset, max_chunk_bytes)
+
+    else:
+        offset, raw_chunk, at_end = read_plain(path, offset, max_chunk_bytes)
+
+    # Only return whole lines, the rest is picked up by the next call.
+    # This also avoids cutting a multi-byte character in half.
+    chunk = raw_chunk
+    last_newline = chunk.rfind(b'\n')
+
+    if last_newline != -1:
+        chunk = chunk[:last_newline + 1]
+
+    elif len(chunk) < max_chunk_bytes:
+        chunk = b''
+
+    return {
+        'start': offset,
+        'content': chunk.decode('utf-8', errors = 'replace'),
+        'offset': offset + len(chunk),
+        # An empty chunk means only a partial line is left, wait for the writer instead
+        'has_more': len(chunk) > 0 and (len(chunk) < len(raw_chunk) or not at_end),
+    }
+
+
+def get_log(task_id: str, offset: int = 0) -> dict | None:
+    # Maintenance may compress or delete the log between the lookup and the read, so look again once
+    for _ in range(2):
+        log_file_path = download_history_db.get_log_file_path_by_id(task_id)
+
+        # The log file only appears once yt-dlp writes its first message
+        if log_file_path is None or not Path(log_file_path).exists():
+            return None
+
+        try:
+            return read_chunk(Path(log_file_path), offset)
+
+        except FileNotFoundError:
+            continue
+
+    return None
+
+
+def compress_log(path: Path) -> Path:
+    compressed_path = path.with_name(path.name + '.gz')
+
+    # Appended as a new gzip member, a redownload on the same day keeps the earlier attempt
+    with path.open(mode = 'rb') as source, gzip.open(compressed_path, mode = 'ab') as target:
+        shutil.copyfileobj(source, target)
+
+    path.unlink()
+
+    return compressed_path
+
+
+def run_maintenance():
+    if not logs_dir.exists():
+        return
+
+    # Logs that are still written to are never touched
+    active_ids = task_log_writer.get_active_ids()
+    index = download_history_db.get_log_index()
+
+    # (new path, old path) for the history table, which doubles as the task -> log index
+    changes: list[tuple[str | None, str]] = []
+
+    for path in logs_dir.glob('*/*.log'):
+        entry = index.get(str(path))
+
+        if get_task_id(path) in active_ids or (entry is not None and entry[1] not in terminal_statuses):
+            continue
+
+        try:
+            compressed_path = compress_log(path)
+
+        except OSError:
+            # E.g. still opened by a reader on Windows, try again next time
+            continue
+
+        changes.append((str(compressed_path), str(path)))
+
+    def remove(path: Path) -> bool:
+        # An open reader would keep the file from being deleted on Windows
+        close_gzip_cursor(path)
+
+        try:
+            path.unlink()
+
+        except OSError:
+            return False
+
+        changes.append((None, str(path)))
+
+        return True
+
+    # Day folders are named by date, so older folders sort first
+    cutoff = (date.today() - timedelta(days = get_log_retention_days())).isoformat()
+    day_dirs = sorted(path for path in logs_dir.iterdir() if path.is_dir())
+
+    files = []
+
+    for day_dir in day_dirs:
+        for path in day_dir.iterdir():
+            if get_task_id(path) in active_ids:
+                continue
+
+            if day_dir.name < cutoff:
+                remove(path)
+
+            else:
+                try:
+                    stat = path.stat()
+
+                except OSError:
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, path))
+
+    # Over the size budget, the oldest files go first
+    total_size = sum(size for _, size, _ in files)
+    max_total_size = get_log_max_total_bytes()
+
+    for _, size, path in sorted(files):
+        if total_size <= max_total_size:
+            break
+
+        if remove(path):
+            total_size -= size
+
+    for day_dir in day_dirs:
+        if day_dir.name != date.today().isoformat() and not any(day_dir.iterdir()):
+            day_dir.rmdir()
+
+    if changes:
+        download_history_db.replace_log_file_paths(changes)
+
+
+def maintain():
+    while True:
+        try:
+            run_maintenance()
+
+        except Exception:
+            traceback.print_exc()
+
+        maintenance_event.wait(maintenance_interval)
+        maintenance_event.clear()
+
+
+def start_maintenance():
+    threading.Thread(target = maintain, daemon = True, name = 'log-maintenance').start()
+
+
+def schedule_maintenance():
+    # Run now instead of waiting for the interval, e.g. after the retention settings changed
+    maintenance_event.set()
@@ -0,0 +1,67 @@
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Callable
+
+
+@dataclass
+class DeferredStep:
+    filename: str
+    info: dict
+    files_to_move: dict
+
+
+@dataclass
+class PostprocessJob:
+    id: str
+    task: dict
+    opts: dict
+    canonical_key: str | None
+    steps: list[DeferredStep] = field(default_factory = list)
+
+
+@cache
+def get_deferred_youtube_dl() -> type:
+    # Defined on first use, subclassing at import time would import yt-dlp on startup
+    from yt_dlp import YoutubeDL
+
+    class DeferredYoutubeDL(YoutubeDL):
+        # Records post-processing (merging, audio extraction, fixups) instead of running it inline,
+        # so the download worker is free once the transfer ends
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+
+            self.deferred_steps: list[DeferredStep] = []
+
+
+        def post_process(self, filename, info, files_to_move = None):
+            self.deferred_steps.append(DeferredStep(filename, dict(info), dict(files_to_move or {})))
+
+            info['filepath'] = filename
+
+            return info
+
+    return DeferredYoutubeDL
+
+
+def run_steps(job: PostprocessJob, is_cancelled: Callable[[], bool]) -> list[str]:
+    from yt_dlp import YoutubeDL
+
+    # Returns the final paths, they are only known after post-processing
+    filepaths = []
+
+    with YoutubeDL(job.opts) as ydl:
+        for step in job.steps:
+            # A running ffmpeg is not interrupted, but the remaining steps are skipped
+            if is_cancelled():
+                break
+
+            # Mergers and fixups were created for the downloading instance
+            for pp in step.info.get('__postprocessors') or []:
+                pp.set_downloader(ydl)
+
+            info = ydl.post_process(step.filename, step.info, step.files_to_move)
+
+            if info.get('filepath'):
+                filepaths.append(info['filepath'])
+
+    return filepaths
@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import cProfile
+import io
+import pstats
+import threading
+import tracemalloc
+
+from database.download_history import download_history_db
+from database.setting import setting_db
+
+
+# Stages a task goes through, each gets its own profile dump
+stages = ('probe', 'download', 'postprocess')
+
+top_functions = 40
+top_allocations = 25
+
+# cProfile and tracemalloc are process-wide, see profile_stage()
+profiler_lock = threading.Lock()
+tracing_lock = threading.Lock()
+tracing_users = 0
+
+
+def get_dump_path(log_path: Path, suffix: str) -> Path:
+    # Next to the task log (also when it was compressed to <id>.log.gz), e.g. logs/<date>/<id>.download.prof
+    return log_path.with_name(f'{log_path.name.partition(".")[0]}{suffix}')
+
+
+def append_report(path: Path, stage: str, report: str):
+    path.parent.mkdir(parents = True, exist_ok = True)
+
+    with path.open(mode = 'a', encoding = 'utf-8') as f:
+        f.write(f'===== {stage} at {datetime.now().isoformat(timespec = "seconds")} =====\n{report}\n')
+
+
+def start_tracing():
+    global tracing_users
+
+    with tracing_lock:
+        if tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        tracing_users += 1
+
+
+def stop_tracing():
+    global tracing_users
+
+    with tracing_lock:
+        tracing_users -= 1
+
+        if tracing_users == 0:
+            tracemalloc.stop()
+
+
+@contextmanager
+def profile_stage(log_path: Path, stage: str, write_log):
+    profile = setting_db.get_value_by_name('profile_tasks') == 'true'
+    trace_allocations = setting_db.get_value_by_name('trace_allocations') == 'true'
+
+    if not profile and not trace_allocations:
+        yield
+        return
+
+    profiler = None
+
+    # Since Python 3.12 only one profiler can be active, and it sees every thread.
+    # Profiled stages take turns, so with profiling on they run one at a time.
+    if profile:
+        profiler_lock.acquire()
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+
+        except ValueError:
+            # Someone else (e.g. a debugger) holds the profiling hook
+            profiler_lock.release()
+            profiler = None
+
+            write_log(f'[profile] {stage} not profiled, another profiler is active')
+
+    if trace_allocations:
+        start_tracing()
+        before = tracemalloc.take_snapshot()
+
+    try:
+        yield
+
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler_lock.release()
+
+            # The task may not have logged anything yet
+            log_path.parent.mkdir(parents = True, exist_ok = True)
+            profiler.dump_stats(get_dump_path(log_path, f'.{stage}.prof'))
+
+            report = io.StringIO()
+            pstats.Stats(profiler, stream = report).sort_stats('cumulative').print_stats(top_functions)
+
+            append_report(get_dump_path(log_path, '.profile.txt'), stage, report.getvalue())
+
+        if trace_allocations:
+            after = tracemalloc.take_snapshot()
+            stop_tracing()
+
+            # Includes allocations of other threads running at the same time
+            lines = [str(stat) for stat in after.compare_to(before, 'lineno')[:top_allocations]]
+
+            append_report(get_dump_path(log_path, '.alloc.txt'), stage, '\n'.join(lines) + '\n')
+
+
+def get_profile(task_id: str) -> dict | None:
+    log_file_path = download_history_db.get_log_file_path_by_id(task_id)
+
+    if log_file_path is None:
+        return None
+
+    log_path = Path(log_file_path)
+
+    def read(suffix: str) -> str | None:
+        path = get_dump_path(log_path, suffix)
+
+        return path.read_text(encoding = 'utf-8') if path.exists() else None
+
+    return {
+        'profile': read('.profile.txt'),
+        'allocations': read('.alloc.txt'),
+        # Raw pstats dumps, e.g. for snakeviz
+        'dumps': [stage for stage in stages if get_dump_path(log_path, f'.{stage}.prof').exists()],
+    }
+
+
+def get_dump(task_id: str, stage: str) -> Path | None:
+    log_file_path = download_history_db.get_log_file_path_by_id(task_id)
+
+    if log_file_path is None or stage not in stages:
+        return None
+
+    path = get_dump_path(Path(log_file_path), f'.{stage}.prof')
+
+    return path if path.exists() else None
@@ -0,0 +1,101 @@
+from typing import Callable
+import threading
+import time
+
+
+class TaskProgress:
+    def __init__(self, now: float):
+        self.last_publish = 0.0
+        self.sample_time = now
+        self.sample_bytes = 0
+        self.speed: float | None = None
+
+
+class ProgressAggregator:
+    def __init__(
+        self,
+        publish: Callable[[str, dict], None],
+        interval: float = 0.1,
+        smoothing: float = 0.3,
+    ):
+        self.publish = publish
+
+        # At most one snapshot per task per interval, yt-dlp reports far more often
+        self.interval = interval
+
+        # Weight of the newest speed sample in the exponential moving average
+        self.smoothing = smoothing
+
+        self.tasks: dict[str, TaskProgress] = {}
+        self.lock = threading.Lock()
+
+
+    def update(self, id: str, d: dict, force: bool = False):
+        # force publishes regardless of the interval, used for the last report of a file
+        now = time.monotonic()
+
+        with self.lock:
+            progress = self.tasks.get(id)
+
+            if progress is None:
+                progress = self.tasks[id] = TaskProgress(now)
+
+                # Speed is measured from here, a resumed file already starts with bytes on disk
+                progress.sample_bytes = d.get('downloaded_bytes') or 0
+
+            if not force and now - progress.last_publish < self.interval:
+                return
+
+            progress.last_publish = now
+
+            downloaded_bytes = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+            elapsed = now - progress.sample_time
+
+            # A smaller count means the next file (e.g. audio after video) started, keep the average
+            if downloaded_bytes >= progress.sample_bytes and elapsed > 0:
+                sample = (downloaded_bytes - progress.sample_bytes) / elapsed
+
+                if progress.speed is None:
+                    progress.speed = sample
+                else:
+                    progress.speed += self.smoothing * (sample - progress.speed)
+
+            progress.sample_time = now
+            progress.sample_bytes = downloaded_bytes
+
+            speed = progress.speed
+
+        total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        percentage = (downloaded_bytes / total_bytes * 100) if total_bytes > 0 else 0
+
+        eta = None
+
+        if speed and total_bytes > downloaded_bytes:
+            eta = round((total_bytes - downloaded_bytes) / speed)
+
+        snapshot = {
+            'status': 'downloading',
+            'progress': round(percentage, 2),
+            'speed': round(speed) if speed is not None else None,
+            'eta': eta,
+            'downloaded_bytes': downloaded_bytes,
+            'total_bytes': total_bytes or None,
+        }
+
+        if d.get('fragment_count'):
+            snapshot.update({
+                'fragment_index': d.get('fragment_index'),
+                'fragment_count': d.get('fragment_count'),
+            })
+
+        self.publish(id, snapshot)
+
+
+    def get_speeds(self) -> dict[str, float]:
+        with self.lock:
+            return { id: progress.speed for id, progress in self.tasks.items() if progress.speed is not None }
+
+
+    def discard(self, id: str):
+        with self.lock:
+            self.tasks.pop(id, None)
@@ -0,0 +1,134 @@
+from pathlib import Path
+from typing import TextIO
+import threading
+import time
+
+
+class TaskLog:
+    def __init__(self, path: Path):
+        self.path = path
+        self.handle: TextIO | None = None
+
+        self.lines: list[str] = []
+        self.size = 0
+
+        # Held while writing to disk, keeps lines in order between the flusher and writers flushing themselves
+        self.write_lock = threading.Lock()
+
+
+class TaskLogWriter:
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        max_task_bytes: int = 256 * 1024,
+        max_total_bytes: int = 4 * 1024 * 1024,
+    ):
+        # Upper bound for how long a line waits in memory
+        self.flush_interval = flush_interval
+
+        # Beyond these, the writing thread flushes its own lines, it gets slowed down instead of memory growing
+        self.max_task_bytes = max_task_bytes
+        self.max_total_bytes = max_total_bytes
+
+        self.logs: dict[str, TaskLog] = {}
+        self.total_size = 0
+        self.lock = threading.Lock()
+
+        threading.Thread(target = self.run, daemon = True, name = 'task-log-flusher').start()
+
+
+    def write(self, id: str, path: Path, msg: str):
+        line = msg + '\n'
+
+        replaced = None
+
+        with self.lock:
+            log = self.logs.get(id)
+
+            # A new path means the task was started again on another day
+            if log is None or log.path != path:
+                replaced = log
+                log = self.logs[id] = TaskLog(path)
+
+            log.lines.append(line)
+            log.size += len(line)
+            self.total_size += len(line)
+
+            over_limit = log.size > self.max_task_bytes or self.total_size > self.max_total_bytes
+
+        if replaced is not None:
+            self.finish(replaced)
+
+        if over_limit:
+            self.flush(log)
+
+
+    def flush(self, log: TaskLog):
+        with log.write_lock:
+            with self.lock:
+                lines = log.lines
+                log.lines = []
+                self.total_size -= log.size
+                log.size = 0
+
+            if not lines:
+                return
+
+            if log.handle is None:
+                log.path.parent.mkdir(parents = True, exist_ok = True)
+
+                # Without encoding format, non-English message will look weird
+                log.handle = log.path.open(mode = 'a', encoding = 'utf-8')
+
+            log.handle.writelines(lines)
+            log.handle.flush()
+
+
+    def finish(self, log: TaskLog):
+        self.flush(log)
+
+        with log.write_lock:
+            if log.handle is not None:
+                log.handle.close()
+                log.handle = None
+
+
+    def close(self, id: str):
+        # Task is done (finished, failed or cancelled), write everything out and release the handle
+        with self.lock:
+            log = self.logs.pop(id, None)
+
+        if log is not None:
+            self.finish(log)
+
+
+    def get_active_ids(self) -> set[str]:
+        with self.lock:
+            return set(self.logs)
+
+
+    def close_all(self):
+        with self.lock:
+            ids = list(self.logs)
+
+        for id in ids:
+            self.close(id)
+
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+
+            with self.lock:
+                logs = [log for log in self.logs.values() if log.lines]
+
+            for log in logs:
+                try:
+                    self.flush(log)
+
+                except OSError:
+                    # E.g. disk full, keep going so other tasks still get their logs
+                    pass
+
+
+task_log_writer = TaskLogWriter()
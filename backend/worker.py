@@ -0,0 +1,88 @@
+from queue import Queue, Empty
+from typing import Callable
+import threading
+import traceback
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        name: str,
+        task_queue: Queue,
+        handler: Callable,
+        idle_timeout: float = 1.0,
+    ):
+        self.name = name
+        self.task_queue = task_queue
+        self.handler = handler
+
+        # Idle workers wake up this often to check whether the pool was shrunk
+        self.idle_timeout = idle_timeout
+
+        self.size = 0
+        self.busy = 0
+        self.workers: set[threading.Thread] = set()
+        self.lock = threading.Lock()
+        self.spawned = 0
+
+
+    def resize(self, size: int):
+        with self.lock:
+            self.size = max(1, size)
+
+            # Shrinking is handled lazily by the workers themselves
+            while len(self.workers) < self.size:
+                self.spawned += 1
+
+                worker = threading.Thread(
+                    target = self.run,
+                    daemon = True,
+                    name = f'{self.name}-{self.spawned}',
+                )
+
+                self.workers.add(worker)
+                worker.start()
+
+
+    def should_retire(self):
+        with self.lock:
+            if len(self.workers) > self.size:
+                self.workers.discard(threading.current_thread())
+                return True
+
+            return False
+
+
+    def run(self):
+        while not self.should_retire():
+            try:
+                task = self.task_queue.get(timeout = self.idle_timeout)
+
+            except Empty:
+                continue
+
+            with self.lock:
+                self.busy += 1
+
+            try:
+                self.handler(*task)
+
+            except Exception:
+                # Keep the worker alive, one failed task should not shrink the pool
+                traceback.print_exc()
+
+            finally:
+                with self.lock:
+                    self.busy -= 1
+
+                self.task_queue.task_done()
+
+
+    def get_info(self) -> dict:
+        with self.lock:
+            return {
+                'size': self.size,
+                'workers': len(self.workers),
+                'busy': self.busy,
+                'queued': self.task_queue.qsize(),
+            }
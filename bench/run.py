@@ -0,0 +1,218 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from uuid import uuid4
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+
+bench_dir = Path(__file__).parent
+
+terminal_statuses = ('finished', 'error', 'cancelled')
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def isolate_app_data(folder: str):
+    # Databases, logs and downloads go to a throwaway folder, must run before backend is imported
+    os.environ['HOME'] = folder
+    os.environ['LOCALAPPDATA'] = folder
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    # Nearest-rank, good enough for comparing runs
+    if not values:
+        return None
+
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def summarize_ms(values: list[float]) -> dict:
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 3) if values else None,
+    }
+
+
+def request_json(url: str, data: dict | None = None) -> tuple[dict, float]:
+    body = json.dumps(data).encode() if data is not None else None
+    request = urllib.request.Request(url, data = body, headers = { 'Content-Type': 'application/json' })
+
+    start = time.perf_counter()
+
+    with urllib.request.urlopen(request) as response:
+        result = json.load(response)
+
+    return result, time.perf_counter() - start
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd = bench_dir.parent,
+            capture_output = True,
+            text = True,
+            check = True,
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_downloads(app_url: str, media_url: str, args) -> tuple[dict, list[str]]:
+    kinds = ['progressive', 'hls'] if args.kind == 'mixed' else [args.kind]
+    size = int(args.size_mb * 1024 * 1024)
+
+    urls = [
+        f'{media_url}/bench/{kinds[n % len(kinds)]}/{size}/v{n}{uuid4().hex[:8]}'
+        for n in range(args.tasks)
+    ]
+
+    start = time.perf_counter()
+
+    response, submit_latency = request_json(f'{app_url}/downloader/start/downloads', { 'urls': urls })
+    ids = response['ids']
+
+    # Same sequence as the UI, queue first and then start the workers
+    request_json(f'{app_url}/downloader/start/worker')
+
+    status_latencies = []
+    statuses: dict[str, str] = {}
+
+    # Poll the way the UI used to, every round hits the status route once per unfinished task
+    while len(statuses) < len(ids) or any(status not in terminal_statuses for status in statuses.values()):
+        if time.perf_counter() - start > args.timeout:
+            break
+
+        for id in ids:
+            if statuses.get(id) in terminal_statuses:
+                continue
+
+            response, latency = request_json(f'{app_url}/downloader/get/status/{id}')
+
+            status_latencies.append(latency)
+            statuses[id] = response['info'].get('status')
+
+        time.sleep(args.poll_interval)
+
+    elapsed = time.perf_counter() - start
+
+    finished = sum(1 for status in statuses.values() if status == 'finished')
+
+    from database.setting import setting_db
+
+    downloaded_bytes = sum(
+        path.stat().st_size
+        for path in Path(setting_db.get_value_by_name('download_location')).rglob('*')
+        if path.is_file()
+    )
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'finished': finished,
+        'failed': len(ids) - finished,
+        'tasks_per_s': round(finished / elapsed, 3),
+        'mb_per_s': round(downloaded_bytes / 1024 / 1024 / elapsed, 3),
+        'submit_ms': round(submit_latency * 1000, 3),
+        'status_latency': summarize_ms(status_latencies),
+    }, ids
+
+
+def bench_sqlite_writes(ids: list[str], rounds: int) -> dict:
+    from database.download_history import download_history_db
+
+    latencies = []
+
+    # Status updates are the most frequent write, they happen on every state change of every task.
+    # Waited on, so this is the time until the update is committed.
+    for n in range(rounds):
+        id = ids[n % len(ids)]
+        start = time.perf_counter()
+
+        download_history_db.update_status_by_id(id, 'finished', wait = True)
+
+        latencies.append(time.perf_counter() - start)
+
+    return summarize_ms(latencies)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog = 'python -m bench', description = 'End to end downloader benchmark against a local media server.')
+    parser.add_argument('--tasks', type = int, default = 20)
+    parser.add_argument('--size-mb', type = float, default = 4)
+    parser.add_argument('--kind', choices = ('progressive', 'hls', 'mixed'), default = 'mixed')
+    parser.add_argument('--poll-interval', type = float, default = 0.1)
+    parser.add_argument('--sqlite-writes', type = int, default = 500)
+    parser.add_argument('--timeout', type = float, default = 600)
+    parser.add_argument('--output', help = 'write the results to this JSON file as well')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix = 'c00ltubee-bench-')
+    isolate_app_data(workdir)
+
+    # yt-dlp discovers plugins on sys.path
+    sys.path.insert(0, str(bench_dir))
+
+    from yt_dlp.plugins import load_all_plugins
+
+    load_all_plugins()
+
+    from backend.app import app
+    from bench.server import MediaServer
+    from database.setting import setting_db
+
+    setting_db.update_user_value_by_name('download_location', str(Path(workdir, 'downloads')))
+
+    media_server = MediaServer()
+    media_server.start()
+
+    app_server = make_server('127.0.0.1', 0, app, server_class = ThreadingWSGIServer, handler_class = QuietHandler)
+    threading.Thread(target = app_server.serve_forever, daemon = True, name = 'bench-app').start()
+
+    app_url = f'http://127.0.0.1:{app_server.server_port}'
+
+    downloads, ids = bench_downloads(app_url, media_server.base_url, args)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec = 'seconds'),
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'params': vars(args),
+        'downloads': downloads,
+        'sqlite_write_latency': bench_sqlite_writes(ids, args.sqlite_writes),
+    }
+
+    output = json.dumps(results, indent = 4)
+    print(output)
+
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding = 'utf-8')
+
+    app_server.shutdown()
+    media_server.shutdown()
+
+    shutil.rmtree(workdir, ignore_errors = True)
+
+    return 0 if downloads['failed'] == 0 else 1
@@ -0,0 +1,131 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import re
+import threading
+
+
+# Synthetic media, the content does not matter, only the transfer does
+block = bytes(range(256)) * 4096
+
+segment_duration = 2
+
+
+def synthetic_bytes(start: int, end: int) -> bytes:
+    # Bytes [start, end) of an endless repetition of block
+    chunks = []
+
+    while start < end:
+        offset = start % len(block)
+        chunk = block[offset:offset + end - start]
+
+        chunks.append(chunk)
+        start += len(chunk)
+
+    return b''.join(chunks)
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    # /media/<size>/progressive/<id>.mp4
+    # /media/<size>/hls/<id>/index.m3u8 and /media/<size>/hls/<id>/<n>.ts
+    progressive_pattern = re.compile(r'/media/(?P<size>\d+)/progressive/\w+\.mp4')
+    playlist_pattern = re.compile(r'/media/(?P<size>\d+)/hls/\w+/index\.m3u8')
+    segment_pattern = re.compile(r'/media/(?P<size>\d+)/hls/\w+/(?P<n>\d+)\.ts')
+
+    protocol_version = 'HTTP/1.1'
+
+
+    def do_GET(self):
+        if match := self.progressive_pattern.fullmatch(self.path):
+            self.send_media(int(match['size']), 'video/mp4')
+
+        elif match := self.playlist_pattern.fullmatch(self.path):
+            self.send_playlist(int(match['size']))
+
+        elif match := self.segment_pattern.fullmatch(self.path):
+            size = int(match['size'])
+            n = int(match['n'])
+            segment_size = self.server.segment_size
+
+            self.send_media(min(segment_size, size - n * segment_size), 'video/mp2t')
+
+        else:
+            self.send_error(404)
+
+
+    def send_media(self, size: int, content_type: str):
+        start, end = 0, size
+
+        # yt-dlp requests ranges when resuming and when splitting large files
+        if match := re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')):
+            start = int(match[1])
+            end = min(size, int(match[2]) + 1) if match[2] else size
+
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        while start < end:
+            chunk_end = min(end, start + len(block))
+
+            self.wfile.write(synthetic_bytes(start, chunk_end))
+            start = chunk_end
+
+
+    def send_playlist(self, size: int):
+        segment_count = -(-size // self.server.segment_size)
+
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{segment_duration}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+        ]
+
+        for n in range(segment_count):
+            lines += [f'#EXTINF:{segment_duration}.0,', f'{n}.ts']
+
+        lines.append('#EXT-X-ENDLIST')
+
+        body = ('\n'.join(lines) + '\n').encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+    def __init__(self, port: int = 0, segment_size: int = 256 * 1024):
+        super().__init__(('127.0.0.1', port), MediaHandler)
+
+        self.segment_size = segment_size
+
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+    def start(self):
+        threading.Thread(target = self.serve_forever, daemon = True, name = 'bench-media').start()
@@ -0,0 +1,83 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.run import bench_dir, get_commit, summarize_ms
+
+
+def launch(command: list[str], app_data: str) -> float:
+    env = {
+        **os.environ,
+        'HOME': app_data,
+        'LOCALAPPDATA': app_data,
+    }
+
+    start = time.perf_counter()
+
+    subprocess.run(command + ['startup-check'], env = env, check = True, stdout = subprocess.DEVNULL)
+
+    return time.perf_counter() - start
+
+
+def bench_startup(command: list[str], runs: int) -> dict:
+    # Cold: a fresh app data folder every time, so the databases the first paint reads are created from scratch.
+    # Dropping the OS file cache needs root, so the interpreter and libraries may still be cached.
+    cold = []
+
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix = 'c00ltubee-startup-') as app_data:
+            cold.append(launch(command, app_data))
+
+    # Warm: an app data folder that was already used once
+    warm = []
+
+    with tempfile.TemporaryDirectory(prefix = 'c00ltubee-startup-') as app_data:
+        launch(command, app_data)
+
+        for _ in range(runs):
+            warm.append(launch(command, app_data))
+
+    return {
+        'command': command,
+        'cold': { **summarize_ms(cold), 'mean_ms': round(statistics.mean(cold) * 1000, 3) },
+        'warm': { **summarize_ms(warm), 'mean_ms': round(statistics.mean(warm) * 1000, 3) },
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog = 'python -m bench.startup',
+        description = 'Time from launch until the window would be created and its first data loaded, for the source and optionally a PyInstaller build.',
+    )
+    parser.add_argument('--runs', type = int, default = 10)
+    parser.add_argument('--executable', help = 'PyInstaller build to measure as well, e.g. dist/c00ltubee (dist/c00ltubee.exe on Windows)')
+    parser.add_argument('--output', help = 'write the results to this JSON file as well')
+    args = parser.parse_args(argv)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': get_commit(),
+        'params': vars(args),
+        'source': bench_startup([sys.executable, str(Path(bench_dir.parent, 'main.py'))], args.runs),
+    }
+
+    if args.executable:
+        results['build'] = bench_startup([str(Path(args.executable).resolve())], args.runs)
+
+    output = json.dumps(results, indent = 4)
+    print(output)
+
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding = 'utf-8')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
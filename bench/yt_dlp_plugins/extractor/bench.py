@@ -0,0 +1,37 @@
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchIE(InfoExtractor):
+    # Matches the pages of bench.server, loaded as a yt-dlp plugin by bench.run
+    IE_NAME = 'bench'
+    _VALID_URL = r'(?P<base>http://127\.0\.0\.1:\d+)/bench/(?P<kind>progressive|hls)/(?P<size>\d+)/(?P<id>\w+)'
+
+
+    def _real_extract(self, url):
+        base, kind, size, video_id = self._match_valid_url(url).group('base', 'kind', 'size', 'id')
+
+        if kind == 'progressive':
+            media_format = {
+                'format_id': 'progressive',
+                'url': f'{base}/media/{size}/progressive/{video_id}.mp4',
+                'filesize': int(size),
+            }
+
+        else:
+            media_format = {
+                'format_id': 'hls',
+                'url': f'{base}/media/{size}/hls/{video_id}/index.m3u8',
+                'protocol': 'm3u8_native',
+            }
+
+        media_format.update({
+            'ext': 'mp4',
+            'vcodec': 'avc1',
+            'acodec': 'mp4a',
+        })
+
+        return {
+            'id': video_id,
+            'title': f'bench {kind} {video_id}',
+            'formats': [media_format],
+        }
@@ -1,12 +1,16 @@
+import time
+
 from database.handler import DBHandler
 
 
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
 class DownloadHistory:
     def __init__(self):
         self.name = 'download_history'
-        self.db_handler = DBHandler(self.name)
-
-        self.init()
+        self.db_handler = DBHandler(self.name, self.init)
     
 
     def init(self):
@@ -18,9 +22,7 @@ class DownloadHistory:
         else:
             # Connect to use existing database
             self.db_handler.connect()
-
-        # Shorthand for faster reference
-        self.connection = self.db_handler.connection
+            self.db_handler.migrate(self.name)
 
 
     def add(
@@ -31,15 +33,28 @@ class DownloadHistory:
         status_type: str,
         log_file_path: str | None = None,
     ):
-        with self.connection as conn:
-            conn.execute(
-                f'INSERT INTO {self.name} (task_id, title, url, status_type, log_file_path) VALUES (?, ?, ?, ?, ?)',
-                (task_id, title, url, status_type, log_file_path),
-            )
+        self.db_handler.write(lambda conn: conn.execute(
+            f'INSERT INTO {self.name} (task_id, title, url, status_type, log_file_path, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (task_id, title, url, status_type, log_file_path, now_ms()),
+        ))
+    
+
+    def add_many_if_missing(
+        self,
+        rows: list[tuple[str, str, str, str, str | None]],
+        parent_id: str | None = None,
+    ):
+        # Rows are (task_id, title, url, status_type, canonical_key), existing task ids (redownloading) are kept as is
+        created_at = now_ms()
+
+        self.db_handler.write(lambda conn: conn.executemany(
+            f'INSERT OR IGNORE INTO {self.name} (task_id, title, url, status_type, canonical_key, created_at, parent_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(*row, created_at, parent_id) for row in rows],
+        ))
     
 
     def get_by_id(self, task_id: str):
-        with self.connection as conn:
+        with self.db_handler.reader() as conn:
             cursor = conn.execute(
                 f'SELECT * FROM {self.name} WHERE task_id = ?',
                 (task_id,),
@@ -60,6 +75,9 @@ class DownloadHistory:
             'url': row[2],
             'status_type': row[3],
             'log_file_path': row[4],
+            'created_at': row[5],
+            'parent_id': row[6],
+            'canonical_key': row[7],
         }
     
 
@@ -77,14 +95,106 @@ class DownloadHistory:
         return log_file_path
     
 
-    def get_all_as_list(self):
-        with self.connection as conn:
-            result: list[dict] = []
+    def get_log_index(self) -> dict[str, tuple[str, str]]:
+        # Log file path -> (task id, status), every log the history still points to
+        with self.db_handler.reader() as conn:
+            return {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(
+                    f'SELECT log_file_path, task_id, status_type FROM {self.name} WHERE log_file_path IS NOT NULL',
+                )
+            }
+    
 
-            for row in conn.execute(f'SELECT * FROM {self.name}'):
-                result.append(self.format_row_as_dict(row))
+    def replace_log_file_paths(self, changes: list[tuple[str | None, str]]):
+        # (new path, old path) pairs, None for logs that were deleted
+        self.db_handler.write(lambda conn: conn.executemany(
+            f'UPDATE {self.name} SET log_file_path = ? WHERE log_file_path = ?',
+            changes,
+        ))
+    
 
-            return result
+    def get_page(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        status_type: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        # Keyset pagination, newest first. The cursor is "<created_at>:<rowid>" of the last row returned.
+        conditions = []
+        params = []
+
+        if status_type is not None:
+            conditions.append('status_type = ?')
+            params.append(status_type)
+
+        if cursor is not None:
+            created_at, rowid = (int(part) for part in cursor.split(':'))
+
+            conditions.append('(created_at, rowid) < (?, ?)')
+            params.extend((created_at, rowid))
+
+        where = f'WHERE {' AND '.join(conditions)}' if conditions else ''
+
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f'SELECT *, rowid FROM {self.name} {where} ORDER BY created_at DESC, rowid DESC LIMIT ?',
+                (*params, limit),
+            ).fetchall()
+
+        result = [self.format_row_as_dict(row) for row in rows]
+
+        # A short page means there is nothing left
+        next_cursor = f'{rows[-1][5]}:{rows[-1][-1]}' if len(rows) == limit else None
+
+        return result, next_cursor
+    
+
+    def iter_all(self, status_type: str | None = None, page_size: int = 500):
+        # Only one page is held in memory at a time
+        cursor = None
+
+        while True:
+            page, cursor = self.get_page(page_size, cursor, status_type)
+
+            yield from page
+
+            if cursor is None:
+                break
+    
+
+    def get_unfinished(self) -> list[dict]:
+        # Tasks that were queued or running when the app was closed, oldest first
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {self.name} WHERE status_type IN ('queued', 'working') ORDER BY created_at, rowid",
+            ).fetchall()
+
+        return [self.format_row_as_dict(row) for row in rows]
+    
+
+    def get_latest_finished_by_canonical_key(self, canonical_key: str) -> dict | None:
+        with self.db_handler.reader() as conn:
+            row = conn.execute(
+                f"SELECT * FROM {self.name} WHERE canonical_key = ? AND status_type = 'finished' ORDER BY created_at DESC LIMIT 1",
+                (canonical_key,),
+            ).fetchone()
+
+        return self.format_row_as_dict(row) if row is not None else None
+    
+
+    def get_child_urls(self, parent_id: str) -> set[str]:
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f'SELECT url FROM {self.name} WHERE parent_id = ?',
+                (parent_id,),
+            ).fetchall()
+
+        return { row[0] for row in rows }
+    
+
+    def get_all_as_list(self):
+        return list(self.iter_all())
     
 
     def update_by_id(
@@ -93,40 +203,48 @@ class DownloadHistory:
         title: str,
         url: str,
         status_type: str,
-        log_file_path: str | None = None
+        log_file_path: str | None = None,
+        wait: bool = False,
     ):
-        with self.connection as conn:
-            conn.execute(
+        # Not coalesced, a later status update must not drop the other columns
+        return self.db_handler.write(
+            lambda conn: conn.execute(
                 f'UPDATE {self.name} SET title = ?, url = ?, status_type = ?, log_file_path = ? WHERE task_id = ?',
                 (title, url, status_type, log_file_path, task_id),
-            )
+            ),
+            wait = wait,
+        )
     
 
     def update_status_by_id(
         self,
         task_id: str,
         status_type: str,
+        wait: bool = False,
     ):
-        with self.connection as conn:
-            conn.execute(
+        # Status changes come from the download hooks and can be frequent, only the latest one is written.
+        # Not waited on by default, pass wait to know it is committed.
+        return self.db_handler.write(
+            lambda conn: conn.execute(
                 f'UPDATE {self.name} SET status_type = ? WHERE task_id = ?',
                 (status_type, task_id),
-            )
+            ),
+            key = ('status', task_id),
+            wait = wait,
+        )
     
 
     def delete_by_id(self, task_id: str):
-        with self.connection as conn:
-            conn.execute(
-                f'DELETE FROM {self.name} WHERE task_id = ?',
-                (task_id,),
-            )
+        self.db_handler.write(lambda conn: conn.execute(
+            f'DELETE FROM {self.name} WHERE task_id = ?',
+            (task_id,),
+        ))
     
 
     def delete_all(self):
-        with self.connection as conn:
-            conn.execute(
-                f'DELETE FROM {self.name}',
-            )
+        self.db_handler.write(lambda conn: conn.execute(
+            f'DELETE FROM {self.name}',
+        ))
 
 
 download_history_db = DownloadHistory()
\ No newline at end of file
@@ -1,13 +1,140 @@
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Iterator
 import sqlite3
+import threading
+import time
+import traceback
 
+from util.metrics import Histogram
 from util.util import get_app_data_location, get_root_dir
 
 
+query_seconds = Histogram(
+    'c00ltubee_sqlite_query_seconds',
+    'Time spent in SQLite execute calls.',
+    ('db', 'method'),
+)
+
+
+class TimedConnection(sqlite3.Connection):
+    # Every database goes through these, so timing them here covers all queries without touching callers.
+    # SELECT rows are fetched lazily, so only the first step is included for them.
+    def execute(self, *args):
+        start = time.perf_counter()
+
+        try:
+            return super().execute(*args)
+
+        finally:
+            query_seconds.observe(time.perf_counter() - start, db = self.name, method = 'execute')
+
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+
+        try:
+            return super().executemany(*args)
+
+        finally:
+            query_seconds.observe(time.perf_counter() - start, db = self.name, method = 'executemany')
+
+
+    def executescript(self, *args):
+        start = time.perf_counter()
+
+        try:
+            return super().executescript(*args)
+
+        finally:
+            query_seconds.observe(time.perf_counter() - start, db = self.name, method = 'executescript')
+
+
+# Every handler, so settings can resize all read pools at once
+handlers: list['DBHandler'] = []
+
+
+def set_read_pool_size(size: int):
+    for handler in handlers:
+        handler.resize_read_pool(size)
+
+
+class WriteTicket:
+    # Handed to callers of DBHandler.write(), resolved once the group holding the write is committed
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Exception | None = None
+
+        # Set when a caller waits on submit, otherwise nobody would see an error
+        self.waited = False
+
+
+    def resolve(self, result: Any = None, error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+    def wait(self, timeout: float | None = None) -> Any:
+        if not self.done.wait(timeout):
+            raise TimeoutError('Database write not committed in time')
+
+        if self.error is not None:
+            raise self.error
+
+        return self.result
+
+
+class PendingWrite:
+    def __init__(self, operation: Callable[[sqlite3.Connection], Any], key: Any, ticket: WriteTicket):
+        self.operation = operation
+        self.key = key
+        self.ticket = ticket
+
+        # Replaced by a newer write with the same key before it was committed
+        self.superseded = False
+
+
 class DBHandler:
-    def __init__(self, name: str):
+    def __init__(
+        self,
+        name: str,
+        setup: Callable[[], None] | None = None,
+        max_group_size: int = 512,
+        read_pool_size: int = 4,
+        statement_cache_size: int = 128,
+    ):
+        self.name = name
         self.db_path = Path(get_app_data_location(), 'db', f'{name}.sqlite')
 
+        self.connection = None
+
+        # Owner's schema setup, run on first use, see ensure_init()
+        self.setup = setup
+        self.ready = False
+        self.init_lock = threading.Lock()
+
+        # Writes from every thread go through a single writer thread and are committed in groups
+        self.max_group_size = max_group_size
+        self.pending_writes: deque[PendingWrite] = deque()
+        self.coalescable_writes: dict[Any, PendingWrite] = {}
+        self.write_condition = threading.Condition()
+        self.writer: threading.Thread | None = None
+
+        # Read-only connections, WAL lets them read while the writer commits
+        self.read_pool_size = read_pool_size
+        self.statement_cache_size = statement_cache_size
+        self.idle_readers: list[sqlite3.Connection] = []
+        self.reader_count = 0
+        self.reader_condition = threading.Condition()
+
+        # Connection held by the current thread, nested reads reuse it instead of taking another
+        self.local = threading.local()
+
+        handlers.append(self)
+
         self.init()
     
 
@@ -16,18 +143,251 @@ class DBHandler:
         # Resolve issue with SQLite only allow same-thread object use
         check_same_thread = False if sqlite3.threadsafety == 3 else True
 
-        self.connection = sqlite3.connect(self.db_path, check_same_thread = check_same_thread)
+        self.connection = self.open_connection(check_same_thread = check_same_thread)
 
         self.setup_connection()
 
+
+    def open_connection(self, **kwargs) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, factory = TimedConnection, **kwargs)
+        connection.name = self.name
+
+        return connection
+
     
     def close(self):
+        # Never used during this run, so never opened
+        if not self.ready:
+            return
+
+        # Let the writer commit what is still queued
+        if self.writer is not None:
+            self.write(None)
+            self.writer.join()
+            self.writer = None
+
+        # Readers still in use belong to daemon threads and go away with the process
+        with self.reader_condition:
+            for connection in self.idle_readers:
+                connection.close()
+
+            self.reader_count -= len(self.idle_readers)
+            self.idle_readers = []
+
         if self.connection:
             self.connection.close()
         else:
             raise RuntimeError('No database connection exist')
 
 
+    def ensure_init(self):
+        # Databases are opened on first use instead of on import, so startup does not wait for them.
+        # setup must only use self.connection, reader() and write() would wait on setup itself.
+        if self.ready:
+            return
+
+        with self.init_lock:
+            if not self.ready:
+                if self.setup is not None:
+                    self.setup()
+
+                self.ready = True
+
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        # Read-only connection from the pool, held by the calling thread until the block ends.
+        # Waits when all of them are in use.
+        self.ensure_init()
+
+        held = getattr(self.local, 'reader', None)
+
+        if held is not None:
+            yield held
+            return
+
+        connection = self.acquire_reader()
+        self.local.reader = connection
+
+        try:
+            yield connection
+
+        finally:
+            self.local.reader = None
+            self.release_reader(connection)
+
+
+    def acquire_reader(self) -> sqlite3.Connection:
+        with self.reader_condition:
+            while not self.idle_readers and self.reader_count >= self.read_pool_size:
+                self.reader_condition.wait()
+
+            if self.idle_readers:
+                return self.idle_readers.pop()
+
+            self.reader_count += 1
+
+        try:
+            return self.open_reader()
+
+        except sqlite3.Error:
+            with self.reader_condition:
+                self.reader_count -= 1
+                self.reader_condition.notify()
+
+            raise
+
+
+    def release_reader(self, connection: sqlite3.Connection):
+        with self.reader_condition:
+            # Pool was shrunk while this one was in use
+            if self.reader_count > self.read_pool_size:
+                self.reader_count -= 1
+                connection.close()
+
+            else:
+                self.idle_readers.append(connection)
+
+            self.reader_condition.notify()
+
+
+    def open_reader(self) -> sqlite3.Connection:
+        # Used by one thread at a time, but not always the same one.
+        # Autocommit, so a read never keeps an old snapshot open between statements.
+        # Prepared statements are cached per connection, each reader keeps its own.
+        connection = self.open_connection(
+            check_same_thread = False,
+            isolation_level = None,
+            cached_statements = self.statement_cache_size,
+        )
+        connection.execute('PRAGMA query_only = 1')
+        connection.execute('PRAGMA busy_timeout = 5000')
+
+        return connection
+
+
+    def resize_read_pool(self, size: int):
+        size = max(1, size)
+
+        with self.reader_condition:
+            self.read_pool_size = size
+
+            # Idle readers above the new size are closed now, busy ones when they are released
+            while self.idle_readers and self.reader_count > size:
+                self.idle_readers.pop().close()
+                self.reader_count -= 1
+
+            self.reader_condition.notify_all()
+
+
+    def write(
+        self,
+        operation: Callable[[sqlite3.Connection], Any] | None,
+        key: Any = None,
+        wait: bool = True,
+    ) -> Any:
+        # Runs operation(connection) on the writer thread. With wait, returns its result once committed,
+        # otherwise returns a WriteTicket right away.
+        # A write with a key replaces a not yet committed write with the same key (e.g. a task's status),
+        # it is queued last so it still lands after every write submitted before it.
+        # operation must not commit or use the connection as a context manager, the writer owns the transaction.
+        self.ensure_init()
+
+        with self.write_condition:
+            if self.writer is None:
+                self.writer = threading.Thread(target = self.run_writer, daemon = True, name = f'{self.name}-writer')
+                self.writer.start()
+
+            ticket = WriteTicket()
+            replaced = self.coalescable_writes.pop(key, None) if key is not None else None
+
+            if replaced is not None:
+                replaced.superseded = True
+                ticket = replaced.ticket
+
+            ticket.waited = ticket.waited or wait
+
+            pending = PendingWrite(operation, key, ticket)
+            self.pending_writes.append(pending)
+
+            if key is not None:
+                self.coalescable_writes[key] = pending
+
+            self.write_condition.notify()
+
+        return ticket.wait() if wait else ticket
+
+
+    def run_writer(self):
+        # Own connection in autocommit mode, transactions are managed explicitly below
+        connection = self.open_connection(isolation_level = None)
+        connection.execute('PRAGMA foreign_keys = 1')
+        connection.execute('PRAGMA busy_timeout = 5000')
+
+        while True:
+            with self.write_condition:
+                while not self.pending_writes:
+                    self.write_condition.wait()
+
+                group = []
+
+                # Everything that queued up during the previous commit goes into this one
+                while self.pending_writes and len(group) < self.max_group_size:
+                    pending = self.pending_writes.popleft()
+
+                    if pending.key is not None and self.coalescable_writes.get(pending.key) is pending:
+                        del self.coalescable_writes[pending.key]
+
+                    group.append(pending)
+
+            results = []
+            stop = False
+
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+
+                for pending in group:
+                    if pending.operation is None:
+                        stop = True
+                        results.append((pending, None, None))
+                        continue
+
+                    if pending.superseded:
+                        continue
+
+                    # A failing write is rolled back on its own, the rest of the group still commits
+                    connection.execute('SAVEPOINT write')
+
+                    try:
+                        result = pending.operation(connection)
+                        connection.execute('RELEASE write')
+                        results.append((pending, result, None))
+
+                    except Exception as e:
+                        connection.execute('ROLLBACK TO write')
+                        connection.execute('RELEASE write')
+                        results.append((pending, None, e))
+
+                connection.execute('COMMIT')
+
+            except sqlite3.Error as e:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+
+                results = [(pending, None, e) for pending in group if not pending.superseded]
+
+            for pending, result, error in results:
+                # Fire-and-forget writes (e.g. status updates) would otherwise fail without a trace
+                if error is not None and not pending.ticket.waited:
+                    traceback.print_exception(error)
+
+                pending.ticket.resolve(result, error)
+
+            if stop:
+                connection.close()
+                return
+
+
     def setup_connection(self):
         connection_setup_sql = '''
         PRAGMA foreign_keys = 1;
@@ -55,6 +415,28 @@ class DBHandler:
             conn.executescript(sql)
     
 
+    def migrate(self, name: str):
+        # Upgrade databases created by older versions, the base SQL file always holds the latest schema
+        migration_dir = Path(get_root_dir(), 'database', 'sql', 'migrations', name)
+
+        if not migration_dir.exists():
+            return
+
+        current_version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+
+        migrations = sorted((int(f.stem), f) for f in migration_dir.glob('*.sql'))
+
+        for version, sql_file in migrations:
+            if version <= current_version:
+                continue
+
+            with sql_file.open() as f:
+                sql = f.read()
+
+            # executescript() commits on its own, so make the whole step a single transaction
+            self.connection.executescript(f'BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;')
+    
+
     def init(self):
         if not self.db_path.parent.exists():
             self.db_path.parent.mkdir(parents = True)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import time
+
+from database.handler import DBHandler
+
+
+class Library:
+    def __init__(self):
+        self.name = 'library'
+        self.db_handler = DBHandler(self.name, self.init)
+    
+
+    def init(self):
+        if not self.db_handler.db_exists():
+            # Connect to initialize database
+            self.db_handler.connect()
+            self.db_handler.load_sql_file(self.name)
+
+        else:
+            # Connect to use existing database
+            self.db_handler.connect()
+
+
+    def format_row_as_dict(self, row):
+        return {
+            'path': row[0],
+            'size': row[1],
+            'mtime_ns': row[2],
+            'content_hash': row[3],
+            'canonical_key': row[4],
+            'task_id': row[5],
+            'indexed_at': row[6],
+        }
+    
+
+    def upsert(
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        content_hash: str,
+        canonical_key: str | None = None,
+        task_id: str | None = None,
+    ):
+        # A rescan must not forget which video an already indexed file belongs to
+        self.db_handler.write(lambda conn: conn.execute(
+            f'''INSERT INTO {self.name} (path, size, mtime_ns, content_hash, canonical_key, task_id, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                content_hash = excluded.content_hash,
+                canonical_key = COALESCE(excluded.canonical_key, canonical_key),
+                task_id = COALESCE(excluded.task_id, task_id),
+                indexed_at = excluded.indexed_at''',
+            (path, size, mtime_ns, content_hash, canonical_key, task_id, int(time.time())),
+        ))
+    
+
+    def get_by_path(self, path: str) -> dict | None:
+        with self.db_handler.reader() as conn:
+            row = conn.execute(
+                f'SELECT * FROM {self.name} WHERE path = ?',
+                (path,),
+            ).fetchone()
+
+        return self.format_row_as_dict(row) if row is not None else None
+    
+
+    def get_by_canonical_key(self, canonical_key: str) -> list[dict]:
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f'SELECT * FROM {self.name} WHERE canonical_key = ?',
+                (canonical_key,),
+            ).fetchall()
+
+        return [self.format_row_as_dict(row) for row in rows]
+    
+
+    def get_by_hash(self, content_hash: str) -> list[dict]:
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f'SELECT * FROM {self.name} WHERE content_hash = ?',
+                (content_hash,),
+            ).fetchall()
+
+        return [self.format_row_as_dict(row) for row in rows]
+    
+
+    def get_all_under(self, folder: str) -> dict[str, dict]:
+        # Path prefix match, escaped so folder names with % or _ match literally
+        pattern = folder.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+        with self.db_handler.reader() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {self.name} WHERE path LIKE ? ESCAPE '\\'",
+                (pattern,),
+            ).fetchall()
+
+        return { row[0]: self.format_row_as_dict(row) for row in rows }
+    
+
+    def move(self, old_path: str, new_path: str, size: int, mtime_ns: int):
+        self.db_handler.write(lambda conn: conn.execute(
+            f'UPDATE {self.name} SET path = ?, size = ?, mtime_ns = ?, indexed_at = ? WHERE path = ?',
+            (new_path, size, mtime_ns, int(time.time()), old_path),
+        ))
+    
+
+    def delete_by_path(self, path: str):
+        self.db_handler.write(lambda conn: conn.execute(
+            f'DELETE FROM {self.name} WHERE path = ?',
+            (path,),
+        ))
+
+
+library_db = Library()
@@ -0,0 +1,127 @@
+import json
+import time
+import zlib
+
+from database.handler import DBHandler
+
+
+class MetadataCache:
+    def __init__(
+        self,
+        ttl_seconds: int = 6 * 60 * 60,
+        max_size_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.name = 'metadata_cache'
+        self.db_handler = DBHandler(self.name, self.init)
+
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+    
+
+    def init(self):
+        if not self.db_handler.db_exists():
+            # Connect to initialize database
+            self.db_handler.connect()
+            self.db_handler.load_sql_file(self.name)
+
+        else:
+            # Connect to use existing database
+            self.db_handler.connect()
+
+
+    def get(self, video_key: str, format_spec: str) -> dict | None:
+        now = time.time()
+
+        with self.db_handler.reader() as conn:
+            row = conn.execute(
+                f'SELECT info, format_spec, expires_at FROM {self.name} WHERE video_key = ?',
+                (video_key,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        info, cached_format_spec, expires_at = row
+
+        # Bookkeeping writes are not waited on, a lookup should not wait for a commit
+        if expires_at <= now:
+            self.db_handler.write(
+                lambda conn: conn.execute(
+                    f'DELETE FROM {self.name} WHERE video_key = ? AND expires_at <= ?',
+                    (video_key, now),
+                ),
+                wait = False,
+            )
+
+            return None
+
+        # Info was resolved for another format selection, treat it as a miss
+        if cached_format_spec != format_spec:
+            return None
+
+        self.db_handler.write(
+            lambda conn: conn.execute(
+                f'UPDATE {self.name} SET last_used_at = ? WHERE video_key = ?',
+                (now, video_key),
+            ),
+            key = ('last_used_at', video_key),
+            wait = False,
+        )
+
+        return json.loads(zlib.decompress(info))
+    
+
+    def put(
+        self,
+        video_key: str,
+        format_spec: str,
+        info: dict,
+        expires_at: int | None = None,
+    ):
+        now = time.time()
+
+        # Media URLs may expire earlier than the configured TTL
+        ttl_expires_at = now + self.ttl_seconds
+        expires_at = ttl_expires_at if expires_at is None else min(expires_at, ttl_expires_at)
+
+        compressed_info = zlib.compress(json.dumps(info).encode('utf-8'))
+
+        def store(conn):
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.name} (video_key, format_spec, info, size, expires_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (video_key, format_spec, compressed_info, len(compressed_info), expires_at, now),
+            )
+
+            self.evict(conn, now)
+
+        # The probe goes on with the info it already has, no need to wait for the commit
+        self.db_handler.write(store, wait = False)
+    
+
+    def evict(self, conn, now: float):
+        conn.execute(
+            f'DELETE FROM {self.name} WHERE expires_at <= ?',
+            (now,),
+        )
+
+        # Least recently used entries go first once the total size is over the limit
+        conn.execute(
+            f'''DELETE FROM {self.name} WHERE video_key IN (
+                SELECT video_key FROM (
+                    SELECT video_key, SUM(size) OVER (ORDER BY last_used_at DESC, rowid DESC) AS total_size
+                    FROM {self.name}
+                )
+                WHERE total_size > ?
+            )''',
+            (self.max_size_bytes,),
+        )
+    
+
+    def delete(self, video_key: str):
+        self.db_handler.write(lambda conn: conn.execute(
+            f'DELETE FROM {self.name} WHERE video_key = ?',
+            (video_key,),
+        ))
+
+
+metadata_cache_db = MetadataCache()
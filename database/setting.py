@@ -1,4 +1,6 @@
+import os
 from pathlib import Path
+import threading
 
 from database.handler import DBHandler
 
@@ -6,36 +8,57 @@ from database.handler import DBHandler
 class Setting:
     def __init__(self):
         self.name = 'setting'
-        self.db_handler = DBHandler(self.name)
+        self.db_handler = DBHandler(self.name, self.init)
 
-        self.init()
+        # Bumped on every change, lets callers memoize values derived from settings
+        self.version = 0
+        self.lock = threading.Lock()
     
 
     def init(self):
-        if not self.db_handler.db_exists():
-            # Connect to initialize database
-            self.db_handler.connect()
-            self.db_handler.load_sql_file(self.name)
-
-            # Download location is different for each OSes, hence it is inserted manually here
-            download_location = str(Path(Path.home(), 'Downloads'))
-
-            with self.db_handler.connection as conn:
-                conn.execute(
-                    f'INSERT INTO {self.name} (name, value_type, default_value) VALUES (?, ?, ?)',
-                    ('download_location', 'location_folder', download_location),
-                )
-
-        else:
-            # Connect to use existing database
-            self.db_handler.connect()
-
-        # Shorthand for faster reference
-        self.connection = self.db_handler.connection
+        self.db_handler.connect()
+
+        # The schema is idempotent, so loading it on every start also adds settings introduced by newer versions
+        self.db_handler.load_sql_file(self.name)
+
+        # These defaults depend on the machine, hence they are inserted manually here
+        machine_defaults = [
+            ('download_location', 'location_folder', str(Path(Path.home(), 'Downloads'))),
+            ('max_concurrent_downloads', 'text', str(os.cpu_count() or 1)),
+            # Extraction mostly waits on the network, so it can run wider than the core count
+            ('max_concurrent_probes', 'text', str(max(4, (os.cpu_count() or 1) * 2))),
+            # ffmpeg keeps a core busy, more jobs than cores only makes every job slower
+            ('max_concurrent_postprocessing', 'text', str(os.cpu_count() or 1)),
+        ]
+
+        with self.db_handler.connection as conn:
+            conn.executemany(
+                f'INSERT OR IGNORE INTO {self.name} (name, value_type, default_value) VALUES (?, ?, ?)',
+                machine_defaults,
+            )
+
+        self.load_snapshot()
+
+
+    @property
+    def snapshot(self) -> dict:
+        self.db_handler.ensure_init()
+
+        return self.current_snapshot
+    
+
+    def load_snapshot(self):
+        # Process-wide copy of every setting, readers never touch the database.
+        # The snapshot is replaced as a whole, so readers always see a consistent state.
+        with self.db_handler.connection as conn:
+            self.current_snapshot = {
+                row[0]: self.format_row_as_dict(row)
+                for row in conn.execute(f'SELECT * FROM {self.name}')
+            }
     
 
     def get_by_name(self, name: str):
-        with self.connection as conn:
+        with self.db_handler.reader() as conn:
             cursor = conn.execute(
                 f'SELECT * FROM {self.name} WHERE name = ?',
                 (name,),
@@ -59,9 +82,12 @@ class Setting:
     
 
     def get_by_name_as_dict(self, name: str):
-        row = self.get_by_name(name)
+        setting = self.snapshot.get(name)
 
-        return self.format_row_as_dict(row)
+        if setting is None:
+            raise ValueError('Setting not found:', name)
+
+        return dict(setting)
     
 
     def get_value_by_name(self, name: str):
@@ -79,13 +105,7 @@ class Setting:
 
 
     def get_all_as_list(self):
-        with self.connection as conn:
-            result: list[dict] = []
-
-            for row in conn.execute(f'SELECT * FROM {self.name}'):
-                result.append(self.format_row_as_dict(row))
-            
-            return result
+        return [dict(setting) for setting in self.snapshot.values()]
     
 
     def update_user_value_by_name(
@@ -93,11 +113,19 @@ class Setting:
         name: str,
         user_value: str,
     ):
-        with self.connection as conn:
-            conn.execute(
+        # Write-through, the snapshot only changes once the database accepted the value
+        with self.lock:
+            self.db_handler.write(lambda conn: conn.execute(
                 f'UPDATE {self.name} SET user_value = ? WHERE name = ?',
                 (user_value, name),
-            )
+            ))
+
+            if name in self.snapshot:
+                snapshot = dict(self.snapshot)
+                snapshot[name] = { **snapshot[name], 'user_value': user_value }
+
+                self.current_snapshot = snapshot
+                self.version += 1
 
 
 setting_db = Setting()
\ No newline at end of file
@@ -8,10 +8,26 @@ CREATE TABLE download_history (
     url TEXT NOT NULL,
     status_type TEXT NOT NULL,
     log_file_path TEXT NULL DEFAULT NULL,
+    -- Milliseconds since epoch, used for ordering and pagination
+    created_at INTEGER NOT NULL DEFAULT 0,
+    -- Playlist task this entry was expanded from
+    parent_id TEXT NULL DEFAULT NULL,
+    -- Extractor name plus video id, the same video submitted through different URLs shares it
+    canonical_key TEXT NULL DEFAULT NULL,
 
     PRIMARY KEY (task_id),
     FOREIGN KEY (status_type) REFERENCES history_status_type (type),
     UNIQUE (task_id)
 );
 
-INSERT INTO history_status_type (type) VALUES ('queued'), ('working'), ('finished'), ('error'), ('cancelled');
\ No newline at end of file
+CREATE INDEX download_history_created_at_idx ON download_history (created_at);
+CREATE INDEX download_history_status_type_created_at_idx ON download_history (status_type, created_at);
+CREATE INDEX download_history_parent_id_idx ON download_history (parent_id);
+CREATE INDEX download_history_canonical_key_idx ON download_history (canonical_key);
+-- Log maintenance looks tasks up by their log file
+CREATE INDEX download_history_log_file_path_idx ON download_history (log_file_path);
+
+INSERT INTO history_status_type (type) VALUES ('queued'), ('working'), ('finished'), ('error'), ('cancelled');
+
+-- Keep in sync with the latest file in migrations/download_history
+PRAGMA user_version = 6;
@@ -0,0 +1,16 @@
+CREATE TABLE library (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    -- Unknown for files found by a rescan rather than downloaded by us
+    canonical_key TEXT NULL DEFAULT NULL,
+    task_id TEXT NULL DEFAULT NULL,
+    indexed_at INTEGER NOT NULL,
+
+    PRIMARY KEY (path),
+    UNIQUE (path)
+);
+
+CREATE INDEX library_canonical_key_idx ON library (canonical_key);
+CREATE INDEX library_content_hash_idx ON library (content_hash);
@@ -0,0 +1,13 @@
+CREATE TABLE metadata_cache (
+    video_key TEXT NOT NULL,
+    format_spec TEXT NOT NULL,
+    info BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+
+    PRIMARY KEY (video_key),
+    UNIQUE (video_key)
+);
+
+CREATE INDEX metadata_cache_last_used_at_idx ON metadata_cache (last_used_at);
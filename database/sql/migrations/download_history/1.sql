@@ -0,0 +1,7 @@
+ALTER TABLE download_history ADD COLUMN created_at INTEGER NOT NULL DEFAULT 0;
+
+-- Existing rows keep their relative order through rowid
+UPDATE download_history SET created_at = CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER);
+
+CREATE INDEX IF NOT EXISTS download_history_created_at_idx ON download_history (created_at);
+CREATE INDEX IF NOT EXISTS download_history_status_type_created_at_idx ON download_history (status_type, created_at);
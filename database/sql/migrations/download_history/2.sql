@@ -0,0 +1,3 @@
+ALTER TABLE download_history ADD COLUMN parent_id TEXT NULL DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS download_history_parent_id_idx ON download_history (parent_id);
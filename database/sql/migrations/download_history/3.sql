@@ -0,0 +1,3 @@
+ALTER TABLE download_history ADD COLUMN canonical_key TEXT NULL DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS download_history_canonical_key_idx ON download_history (canonical_key);
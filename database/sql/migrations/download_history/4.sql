@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS download_history_log_file_path_idx ON download_history (log_file_path);
@@ -0,0 +1,2 @@
+-- Superseded by 6.sql, which adds the index back
+DROP INDEX IF EXISTS download_history_canonical_key_idx;
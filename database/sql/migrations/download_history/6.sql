@@ -0,0 +1,2 @@
+-- Finished downloads are looked up by canonical key before extracting again
+CREATE INDEX IF NOT EXISTS download_history_canonical_key_idx ON download_history (canonical_key);
@@ -1,8 +1,8 @@
-CREATE TABLE setting_value_type (
+CREATE TABLE IF NOT EXISTS setting_value_type (
     type TEXT PRIMARY KEY UNIQUE NOT NULL
 );
 
-CREATE TABLE setting (
+CREATE TABLE IF NOT EXISTS setting (
     name TEXT NOT NULL,
     value_type TEXT NOT NULL,
     default_value TEXT NOT NULL,
@@ -13,11 +13,21 @@ CREATE TABLE setting (
     UNIQUE (name)
 );
 
-INSERT INTO setting_value_type (type) VALUES ('text'), ('boolean'), ('location_folder');
-INSERT INTO setting (name, value_type, default_value) VALUES
+INSERT OR IGNORE INTO setting_value_type (type) VALUES ('text'), ('boolean'), ('location_folder');
+INSERT OR IGNORE INTO setting (name, value_type, default_value) VALUES
 ('default_audio_format', 'text', 'mp3'),
 ('default_video_format', 'text', 'mp4'),
 ('audio_only', 'boolean', 'false'),
+('playlist_mode', 'boolean', 'false'),
+('bandwidth_limit', 'text', '0'),
+('bandwidth_schedule', 'text', ''),
+('max_fragment_connections', 'text', '16'),
+('profile_tasks', 'boolean', 'false'),
+('trace_allocations', 'boolean', 'false'),
+('log_retention_days', 'text', '30'),
+('log_max_total_mb', 'text', '512'),
+('db_read_connections', 'text', '4'),
+('rescan_library_on_startup', 'boolean', 'false'),
 ('output_template', 'text', '%(title)s.%(ext)s'),
 
 ('text_color', 'text', 'white'),
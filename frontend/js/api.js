@@ -1,13 +1,16 @@
 export function attachApi() {
     return {
         getHistory: async (id) => await fetchJson(`/history/get/${id}`),
+        listHistory: async (cursor = null, limit = 100) => await fetchJson(`/history/list?limit=${limit}${cursor ? `&cursor=${cursor}` : ''}`),
         deleteHistory: async (id) => await fetchJson(`/history/delete/${id}`),
 
         startDownload: async (url, id = null) => await fetchJson('/downloader/start/download', 'POST', { url: url, id: id }),
+        startDownloads: async (urls, ids = null) => await fetchJson('/downloader/start/downloads', 'POST', { urls: urls, ids: ids }),
         startWorker: async () => await fetchJson('/downloader/start/worker'),
         getDownloadStatus: async (id) => await fetchJson(`/downloader/get/status/${id}`),
-        getLog: async (id) => await fetchJson(`/downloader/get/log/${id}`),
+        getLog: async (id, offset = 0) => await fetchJson(`/downloader/get/log/${id}?offset=${offset}`),
         cancelDownload: async (id) => await fetchJson(`/downloader/cancel/${id}`),
+        subscribeTaskEvents: () => new EventSource('/downloader/events'),
 
         getSettings: async () => await fetchJson('/setting/get/all'),
         saveSetting: async (name, value) => await fetchJson('/setting/save', 'POST', { name: name, value: value }),
@@ -1,7 +1,6 @@
 import { api, state } from '../main.js';
-import { createDownloadCard } from './downloadCard.js';
+import { createDownloadCard, updateDownloadCard } from './downloadCard.js';
 import { toggleSidebar } from './sidebar.js';
-import { startStatusPolling } from './statusPolling.js';
 
 function renderAddUrlsUI() {
     const sidebarMain = document.getElementById('sidebar-main');
@@ -40,15 +39,18 @@ async function handleDownload() {
     // Prevent user interaction before worker is started
     handleAddUrlsUI(true);
 
-    const urls = input.split('\n');
+    const urls = input.split('\n').map((url) => url.trim()).filter((url) => url !== '');
 
-    for (const url of urls) {
-        const response = await api.startDownload(url);
-        const id = response.id;
+    const response = await api.startDownloads(urls);
+
+    for (const id of response.ids) {
+        // Duplicate URLs are merged into an existing task which already has a card
+        if (document.querySelector(`.download-card[data-id="${id}"]`)) continue;
 
         createDownloadCard(id, {});
 
-        state.pollers[id] = await startStatusPolling(id);
+        // Events for this task may have arrived before its card existed
+        updateDownloadCard(id, state.tasks[id] ?? { 'status': 'queued' });
     }
 
     await api.startWorker();
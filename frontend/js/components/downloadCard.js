@@ -3,9 +3,8 @@ import { setupDialog } from "./dialog.js";
 import { getHistory, handleDeleteHistory } from "./history.js";
 import { getLog } from "./log.js";
 import { toggleSidebar } from "./sidebar.js";
-import { startStatusPolling } from "./statusPolling.js";
 
-export function createDownloadCard(id, info) {
+export function createDownloadCard(id, info, append = false) {
     const container = document.createElement('div');
     container.classList.add('download-card');
     container.dataset.id = id;
@@ -27,7 +26,12 @@ export function createDownloadCard(id, info) {
         throw new Error('contentMain not found');
     }
 
-    contentMain.prepend(container);
+    // New tasks go on top, older history pages are added below
+    if (append) {
+        contentMain.append(container);
+    } else {
+        contentMain.prepend(container);
+    }
 
     const cardViewButton = container.querySelector('.card-view');
 
@@ -110,9 +114,29 @@ export function updateDownloadCard(id, info) {
             titleElement.textContent = info['title'];
             break;
 
+        // Interrupted download from a previous session, until it is resumed
+        case 'working':
         case 'downloading':
             statusText += 'Downloading...';
-            percentElement.textContent = `${info['progress']}%`;
+
+            if (info['progress'] !== undefined) {
+                percentElement.textContent = `${info['progress']}%`;
+            }
+
+            if (info['speed']) {
+                statusText += ` ${formatBytes(info['speed'])}/s`;
+            }
+
+            if (info['eta'] !== null && info['eta'] !== undefined) {
+                statusText += `, ETA ${formatDuration(info['eta'])}`;
+            }
+
+            break;
+
+        // Transfer is done, merging or converting is waiting for a free core
+        case 'postprocessing':
+            statusText += 'Processing...';
+            percentElement.textContent = '100%';
             break;
 
         case 'finished':
@@ -132,6 +156,12 @@ export function updateDownloadCard(id, info) {
         
         case 'queued':
             statusText += 'Queued';
+
+            // Title is resolved ahead of the download
+            if (info['title']) {
+                titleElement.textContent = info['title'];
+            }
+
             break;
         
         case 'cancelled':
@@ -181,11 +211,7 @@ export async function renderCardInfo(id, info) {
         throw new Error(`deleteButton or taskButton for card id ${id} not found`);
     }
 
-    const log = await getLog(id);
-
-    if (log) {
-        updateLog(id, log);
-    }
+    await refreshLog(id);
 
     deleteButton.addEventListener('click', () => setupDialog(
         `Are you sure to delete history id\n"${id}"?`,
@@ -213,8 +239,6 @@ async function handleTaskButtonOperation() {
 
             await api.startDownload(url, id);
 
-            state.pollers[id] = await startStatusPolling(id);
-
             await api.startWorker();
 
             break;
@@ -248,7 +272,9 @@ export function updateCardInfo(id, info) {
 
     switch (info['status']) {
         case 'starting':
+        case 'working':
         case 'downloading':
+        case 'postprocessing':
         case 'queued':
             taskButtonOperation = 'cancel';
             taskButtonText = 'Cancel';
@@ -275,11 +301,16 @@ export function updateCardInfo(id, info) {
     deleteButton.disabled = enableDelete ? false : true;
 }
 
-export function updateLog(id, log) {
+export async function refreshLog(id) {
+    // Read until caught up, each response is capped by the backend
+    while (await appendNewLog(id));
+}
+
+async function appendNewLog(id) {
     const cardInfo = document.querySelector(`#sidebar-main[data-content-type="card-info"][data-id="${id}"]`);
 
     // If not currently viewing, skip
-    if (!cardInfo) return;
+    if (!cardInfo) return false;
 
     const logElement = cardInfo.querySelector('.log');
 
@@ -287,7 +318,23 @@ export function updateLog(id, log) {
         throw new Error(`logElement id ${id} not found`);
     };
 
-    logElement.textContent = log;
+    const offset = Number(logElement.dataset.offset ?? 0);
+    const log = await getLog(id, offset);
+
+    if (!log) return false;
+
+    // Another refresh already consumed this chunk, or the card was re-rendered meanwhile
+    if (!logElement.isConnected || Number(logElement.dataset.offset ?? 0) !== offset) return false;
+
+    // Log file was replaced, e.g. after a redownload
+    if (log.start !== offset) {
+        logElement.textContent = '';
+    }
+
+    logElement.append(log.content);
+    logElement.dataset.offset = log.offset;
+
+    return log.hasMore;
 }
 
 export function handleCardViewRetract(id) {
@@ -304,4 +351,29 @@ export function handleCardViewRetract(id) {
     }
 
     cardView.textContent = '>';
+}
+
+function formatBytes(bytes) {
+    const units = ['B', 'KiB', 'MiB', 'GiB'];
+    let value = bytes;
+    let unit = 0;
+
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
+    }
+
+    return `${value.toFixed(unit === 0 ? 0 : 1)} ${units[unit]}`;
+}
+
+function formatDuration(seconds) {
+    const hours = Math.floor(seconds / 3600);
+    const minutes = Math.floor((seconds % 3600) / 60);
+    const secs = String(seconds % 60).padStart(2, '0');
+
+    if (hours > 0) {
+        return `${hours}:${String(minutes).padStart(2, '0')}:${secs}`;
+    }
+
+    return `${minutes}:${secs}`;
 }
\ No newline at end of file
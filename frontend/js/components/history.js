@@ -3,20 +3,56 @@ import { setupDialog } from "./dialog.js";
 import { createDownloadCard, updateDownloadCard } from "./downloadCard.js";
 import { cleanupSidebar, toggleSidebar } from "./sidebar.js";
 
+const historyPage = {
+    nextCursor: null,
+    loading: false,
+};
+
 export async function populateHistory() {
-    const history = await getHistory('all');
+    const contentMain = document.querySelector('.content-main[data-page="Home"] main');
 
-    history.forEach((entry) => {
-        const info = {
-            'title': entry['title'],
-            'status': entry['status_type'],
-        }
+    if (!contentMain) {
+        throw new Error('contentMain not found');
+    }
+
+    await loadHistoryPage();
 
-        createDownloadCard(entry['task_id'], info);
-        updateDownloadCard(entry['task_id'], info);
+    // Load older history only when scrolled near the bottom
+    contentMain.addEventListener('scroll', async () => {
+        const nearBottom = contentMain.scrollTop + contentMain.clientHeight >= contentMain.scrollHeight - 200;
+
+        if (nearBottom && historyPage.nextCursor) {
+            await loadHistoryPage(historyPage.nextCursor);
+        }
     });
 }
 
+async function loadHistoryPage(cursor = null) {
+    if (historyPage.loading) return;
+
+    historyPage.loading = true;
+
+    try {
+        const response = await api.listHistory(cursor);
+
+        // Pages come newest first, so each card goes below the previous one
+        response.history.forEach((entry) => {
+            const info = {
+                'title': entry['title'],
+                'status': entry['status_type'],
+            }
+
+            createDownloadCard(entry['task_id'], info, true);
+            updateDownloadCard(entry['task_id'], info);
+        });
+
+        historyPage.nextCursor = response.next_cursor;
+
+    } finally {
+        historyPage.loading = false;
+    }
+}
+
 export async function getHistory(id) {
     const response = await api.getHistory(id);
 
@@ -1,11 +1,16 @@
 import { api } from '../main.js'
 
-export async function getLog(taskId) {
-    const response = await api.getLog(taskId);
+export async function getLog(taskId, offset = 0) {
+    const response = await api.getLog(taskId, offset);
 
     if (response.content !== undefined) {
-        return response.content;
+        return {
+            'start': response.start,
+            'content': response.content,
+            'offset': response.offset,
+            'hasMore': response.has_more,
+        };
     }
 
     return null;
-}
\ No newline at end of file
+}
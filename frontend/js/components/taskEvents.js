@@ -0,0 +1,33 @@
+import { api, state } from "../main.js";
+import { createDownloadCard, refreshLog, updateCardInfo, updateDownloadCard } from "./downloadCard.js";
+
+export function subscribeTaskEvents() {
+    const eventSource = api.subscribeTaskEvents();
+
+    eventSource.addEventListener('message', async (e) => {
+        const event = JSON.parse(e.data);
+
+        await handleTaskEvent(event.id, event.info);
+    });
+
+    return eventSource;
+}
+
+async function handleTaskEvent(id, info) {
+    // Keep the latest info so a card created after this event can still catch up
+    state.tasks[id] = info;
+
+    const card = document.querySelector(`.download-card[data-id="${id}"]`);
+
+    if (!card) {
+        // Playlist entries are created by the backend, other tasks get their card when submitted
+        if (!info['parent_id']) return;
+
+        createDownloadCard(id, {});
+    }
+
+    updateDownloadCard(id, info);
+    updateCardInfo(id, info);
+
+    await refreshLog(id);
+}
@@ -5,12 +5,13 @@ import { handleClearHistoryButton, populateHistory } from "./components/history.
 import { handleNavigation } from "./components/navigation.js";
 import { createAllSettingCards } from "./components/settings.js";
 import { handleSidebarButton } from "./components/sidebar.js";
+import { subscribeTaskEvents } from "./components/taskEvents.js";
 import { watchContainerOverflow } from "./support.js";
 
 export const api = attachApi();
 export const state = {
     isSidebarExtended: false,
-    pollers: {},
+    tasks: {},
 };
 
 await populateHistory();
@@ -22,4 +23,6 @@ handleClearHistoryButton();
 handleDialog();
 handleAddUrlsButton();
 
+subscribeTaskEvents();
+
 watchContainerOverflow();
\ No newline at end of file
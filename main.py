@@ -1,10 +1,14 @@
-import webview
-
 import sys
+import threading
 
-from backend.app import app
+from backend import downloader, library, log
+from backend.config import get_db_read_connections
+from backend.tasklog import task_log_writer
 from util.util import current_os
 from database.download_history import download_history_db
+from database.handler import set_read_pool_size
+from database.library import library_db
+from database.metadata_cache import metadata_cache_db
 from database.setting import setting_db
 
 
@@ -18,7 +22,53 @@ def _get_preferred_renderer():
             raise RuntimeError(f'Unsupported platform: {current_os}')
 
 
+def start_background_tasks():
+    # Nothing here is needed for the first paint, so it runs while the window comes up
+    def run():
+        set_read_pool_size(get_db_read_connections())
+
+        # Pick up tasks interrupted by a crash or by closing the app
+        downloader.resume_unfinished_tasks()
+
+        # Catch up with files changed while the app was closed. The download folder is often shared with
+        # unrelated files, so walking and hashing all of it is opt-in, /library/rescan does it on demand.
+        download_location = setting_db.get_value_by_name('download_location')
+
+        if setting_db.get_value_by_name('rescan_library_on_startup') == 'true':
+            library.start_rescan(download_location)
+
+        else:
+            library.start_refresh(download_location)
+
+        # Compress finished logs and apply the retention settings
+        log.start_maintenance()
+
+    threading.Thread(target = run, daemon = True, name = 'startup').start()
+
+
+def cleanup():
+    task_log_writer.close_all()
+
+    download_history_db.db_handler.close()
+    setting_db.db_handler.close()
+    metadata_cache_db.db_handler.close()
+    library_db.db_handler.close()
+
+
 def main(args: list[str]):
+    # Batch mode for machines without a display, webview is never imported
+    if len(args) > 1 and args[1] == 'headless':
+        from backend import headless
+
+        try:
+            return headless.main(args[2:])
+        finally:
+            cleanup()
+
+    import webview
+
+    from backend.app import app
+
     debug_flag = False
     renderer = _get_preferred_renderer()
 
@@ -31,6 +81,19 @@ def main(args: list[str]):
         
         os.environ['WEBKIT_DISABLE_DMABUF_RENDERER'] = '1'
 
+    # Used by bench/startup.py, exits right where the window would be created,
+    # after loading what the first paint asks for (settings and the first history page)
+    if 'startup-check' in args:
+        try:
+            setting_db.get_all_as_list()
+            download_history_db.get_page(100)
+        finally:
+            cleanup()
+
+        return 0
+
+    start_background_tasks()
+
     webview.create_window(
         title = 'c00ltubee',
         url = app,
@@ -49,9 +112,8 @@ def main(args: list[str]):
     # 
     # Cleanup
     # 
-    download_history_db.db_handler.close()
-    setting_db.db_handler.close()
+    cleanup()
 
 
 if __name__ == '__main__':
-    main(sys.argv)
\ No newline at end of file
+    sys.exit(main(sys.argv))
\ No newline at end of file
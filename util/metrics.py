@@ -0,0 +1,147 @@
+import threading
+
+
+# Every metric registers itself here, /metrics renders them in creation order
+registry: list['Metric'] = []
+
+default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+
+    if extra:
+        pairs.append(extra)
+
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+        self.values: dict[tuple, object] = {}
+        self.lock = threading.Lock()
+
+        registry.append(self)
+
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, '') for name in self.labels)
+
+
+    def render(self) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines += self.render_sample(key, value)
+
+        return lines
+
+
+    def render_sample(self, key: tuple, value) -> list[str]:
+        return [f'{self.name}{format_labels(self.labels, key)} {format_value(value)}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    # Filled in right before rendering, e.g. from the state of the worker pools
+    type = 'gauge'
+
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+
+    def clear(self):
+        # Drops label sets that no longer exist, e.g. finished tasks
+        with self.lock:
+            self.values.clear()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = default_buckets):
+        super().__init__(name, help, labels)
+
+        self.buckets = buckets
+
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+
+        with self.lock:
+            state = self.values.get(key)
+
+            if state is None:
+                # Per-bucket counts, made cumulative when rendering, then sum and count
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+
+            state[1] += value
+            state[2] += 1
+
+
+    def render_sample(self, key: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{format_labels(self.labels, key, f'le="{format_value(bound)}"')} {cumulative}')
+
+        lines += [
+            f'{self.name}_bucket{format_labels(self.labels, key, 'le="+Inf"')} {count}',
+            f'{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}',
+            f'{self.name}_count{format_labels(self.labels, key)} {count}',
+        ]
+
+        return lines
+
+
+def render() -> str:
+    # Prometheus text exposition format 0.0.4
+    lines = []
+
+    for metric in registry:
+        lines += metric.render()
+
+    return '\n'.join(lines) + '\n'